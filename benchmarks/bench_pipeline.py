@@ -0,0 +1,242 @@
+"""Benchmark suite over synthetic org repositories.
+
+Times parse_file, node_and_time_for_notification,
+build_schedule, the end-to-end main() (cold and with a warm cache)
+against a local stub ntfy server, an hour of replayed ticks and a day's and a week's
+agenda from the warm cache, for each requested repo size, and
+writes the results as JSON so runs of different versions can be compared.
+
+    python -m benchmarks.bench_pipeline --sizes 100 1000 10000 --output bench.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+from src.main import (
+    LEDGER_FILENAME,
+    Config,
+    ParseCache,
+    agenda,
+    build_schedule,
+    generate_reminder_intervals,
+    get_timed_nodes,
+    main,
+    node_and_time_for_notification,
+    parse_file,
+    replay,
+)
+from benchmarks.corpus import generate_corpus
+
+
+class StubNtfyHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"] or 0))
+        self.server.received += 1
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def stub_ntfy_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubNtfyHandler)
+    server.received = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server, f"http://127.0.0.1:{server.server_address[1]}/bench"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def measure(
+    function: Callable[[], Any], repeat: int, setup: Callable[[], Any] | None = None
+) -> list[float]:
+    runs: list[float] = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started: float = time.perf_counter()
+        function()
+        runs.append(time.perf_counter() - started)
+    return runs
+
+
+def result(name: str, headings: int, runs: list[float], **extra: Any) -> dict[str, Any]:
+    return {
+        "name": name,
+        "headings": headings,
+        "median_seconds": statistics.median(runs),
+        "min_seconds": min(runs),
+        "runs": runs,
+        **extra,
+    }
+
+
+def bench_size(headings: int, repeat: int, seed: int) -> list[dict[str, Any]]:
+    now: datetime = datetime.now()
+    intervals: dict[str, list[timedelta]] = generate_reminder_intervals()
+    results: list[dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as tmp, tempfile.TemporaryDirectory() as cache_home:
+        base_dir: Path = Path(tmp)
+        # main() keeps its parse cache in the user's cache dir, the benchmark's goes in a temporary one
+        os.environ["XDG_CACHE_HOME"] = cache_home
+        files: list[Path] = generate_corpus(base_dir, headings, now, seed=seed)
+
+        results.append(
+            result(
+                "parse_file",
+                headings,
+                measure(lambda: [parse_file(path=x) for x in files], repeat),
+                files=len(files),
+            )
+        )
+        roots = [parse_file(path=x) for x in files]
+        results.append(
+            result(
+                "node_and_time_for_notification",
+                headings,
+                measure(
+                    lambda: [
+                        node_and_time_for_notification(
+                            time=now, node=x, reminder_intervals=intervals
+                        )
+                        for x in roots
+                    ],
+                    repeat,
+                ),
+            )
+        )
+        nodes = [y for x in roots for y in get_timed_nodes(x)]
+        results.append(
+            result(
+                "build_schedule",
+                headings,
+                measure(
+                    lambda: build_schedule(
+                        nodes=nodes,
+                        start=now.replace(second=0, microsecond=0),
+                        reminder_intervals=intervals,
+                    ),
+                    repeat,
+                ),
+            )
+        )
+
+        config: Config = Config(
+            base_dir=base_dir, reminder_intervals=intervals, ntfy_url="replay"
+        )
+
+        def clear_state():
+            config.cache_path.unlink(missing_ok=True)
+            (base_dir / LEDGER_FILENAME).unlink(missing_ok=True)
+
+        with stub_ntfy_server() as (server, url):
+
+            def run_main():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    main(url, str(base_dir))
+
+            results.append(
+                result("main_cold", headings, measure(run_main, repeat, clear_state))
+            )
+            run_main()
+            results.append(result("main_warm", headings, measure(run_main, repeat)))
+            results[-1]["notifications_sent"] = server.received
+            # the cache the ticks left, with their schedule indexes
+            cache: ParseCache = ParseCache.load(config.cache_path)
+            agenda_config: Config = Config(
+                base_dir=base_dir, reminder_intervals=intervals, ntfy_url=url
+            )
+            for name, span in [
+                ("agenda_day", timedelta(days=1)),
+                ("agenda_week", timedelta(weeks=1)),
+            ]:
+                entries: list[int] = []
+                runs: list[float] = measure(
+                    lambda: entries.append(
+                        len(agenda(agenda_config, now, now + span, cache=cache))
+                    ),
+                    repeat,
+                )
+                results.append(result(name, headings, runs, entries=entries[0]))
+        reports = [replay(config, now, now + timedelta(hours=1)) for _ in range(repeat)]
+        results.append(
+            result(
+                "replay_hour",
+                headings,
+                [x.seconds for x in reports],
+                ticks_per_second=statistics.median(
+                    [x.ticks_per_second for x in reports]
+                ),
+                notifications_sent=len(reports[0].notifications),
+            )
+        )
+    return results
+
+
+def git_revision() -> str | None:
+    try:
+        return (
+            subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                capture_output=True,
+                check=True,
+            )
+            .stdout.decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[100, 1000, 10000],
+        help="headings per synthetic repo",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", type=Path, help="write JSON results here instead of stdout"
+    )
+    args = parser.parse_args()
+    report: dict[str, Any] = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "results": [
+            x for size in args.sizes for x in bench_size(size, args.repeat, args.seed)
+        ],
+    }
+    output: str = json.dumps(report, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        args.output.write_text(output + "\n")
+
+
+if __name__ == "__main__":
+    main_cli()
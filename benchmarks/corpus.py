@@ -0,0 +1,70 @@
+"""Synthetic org repositories for benchmarks.
+
+The mix roughly follows a real agenda repo: most headings are plain notes,
+the rest carry SCHEDULED/DEADLINE timestamps (some repeating, some with
+warnings), plain active timestamps, or are already DONE.
+"""
+
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+HEADINGS_PER_FILE: int = 500
+
+TAGS: list[str] = ["work", "home", "errand", "health", "finance"]
+REPEATERS: list[str] = ["++1d", "++1w", "+1m", ".+1y", "++2h", "++2w"]
+WARNINGS: list[str] = ["-1d", "-2d", "-1w", "-6h"]
+
+
+def org_timestamp(time: datetime, cookie: str = "") -> str:
+    return f"<{time.strftime('%Y-%m-%d %a %H:%M')}{' ' + cookie if cookie else ''}>"
+
+
+def generate_heading(rng: random.Random, index: int, now: datetime) -> str:
+    """One heading with a body, near `now` so that some of them fire"""
+    when: datetime = now.replace(second=0, microsecond=0) + timedelta(
+        minutes=rng.randrange(-3 * 24 * 60, 3 * 24 * 60)
+    )
+    tags: str = f" :{rng.choice(TAGS)}:" if rng.random() < 0.3 else ""
+    body: str = f"  notes for heading {index}\n"
+    kind: float = rng.random()
+    if kind < 0.40:
+        return f"* Note {index}{tags}\n{body}"
+    if kind < 0.55:
+        return f"* TODO Scheduled {index}{tags}\n  SCHEDULED: {org_timestamp(when)}\n{body}"
+    if kind < 0.67:
+        basis: datetime = when - timedelta(days=rng.randrange(0, 3 * 365))
+        return f"* TODO Repeating {index}{tags}\n  SCHEDULED: {org_timestamp(basis, rng.choice(REPEATERS))}\n{body}"
+    if kind < 0.75:
+        return (
+            f"* TODO Deadline {index}{tags}\n  DEADLINE: {org_timestamp(when)}\n{body}"
+        )
+    if kind < 0.82:
+        return f"* TODO Warning {index}{tags}\n  DEADLINE: {org_timestamp(when, rng.choice(WARNINGS))}\n{body}"
+    if kind < 0.92:
+        return f"* Event {index}{tags}\n  {org_timestamp(when)}\n{body}"
+    return f"* DONE Finished {index}{tags}\n  SCHEDULED: {org_timestamp(when)}\n{body}"
+
+
+def generate_corpus(
+    base_dir: Path,
+    headings: int,
+    now: datetime,
+    seed: int = 0,
+    headings_per_file: int = HEADINGS_PER_FILE,
+) -> list[Path]:
+    """Write `headings` headings spread over files of `headings_per_file` below base_dir"""
+    rng: random.Random = random.Random(seed)
+    files: list[Path] = []
+    for file_index, start in enumerate(range(0, headings, headings_per_file)):
+        path: Path = base_dir / f"dir{file_index % 10}" / f"agenda{file_index}.org"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            "#+TITLE: Synthetic agenda\n"
+            + "".join(
+                generate_heading(rng, x, now)
+                for x in range(start, min(start + headings_per_file, headings))
+            )
+        )
+        files.append(path)
+    return files
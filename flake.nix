@@ -130,17 +130,22 @@ User git
 
                                     systemd.services = {
                                         org-notifier = {
-                                            description = "Run org-notifier script";
+                                            description = "Run org-notifier daemon";
                                             after = [ "network.target" ];
+                                            wantedBy = [ "multi-user.target" ];
                                             path = ["/run/current-system/sw"] ++ notifier-pkgs;
+                                            # never give up restarting, a crash loop is slowed down by RestartSec instead
+                                            startLimitIntervalSec = 0;
                                             serviceConfig = {
                                                 PassEnvironemnt = "*";
-                                                Type = "oneshot";
+                                                Type = "simple";
+                                                Restart = "always";
+                                                RestartSec = "10s";
                                                 User = "master";
                                                 EnvironmentFile = [
                                                     "/etc/org-notifier/service-vars"
                                                 ];
-                                                ExecStart = "${python-env}/bin/python3 /etc/main.py";
+                                                ExecStart = "${python-env}/bin/python3 /etc/main.py --daemon";
                                             };
                                         };
                                         git-puller = {
@@ -155,15 +160,6 @@ User git
                                     };
 
                                     systemd.timers = {
-                                        org-notifier = {
-                                            description = "Timer for notification script";
-                                            wantedBy = [ "timers.target" ];
-                                            timerConfig = {
-                                                OnCalendar = "minutely";
-                                                Persistent = true;  # Run immediately if we missed the last trigger
-                                                Unit = "org-notifier.service";
-                                            };
-                                        };
                                         git-puller = {
                                             description = "Timer for git pull";
                                             wantedBy = [ "timers.target" ];
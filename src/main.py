@@ -1,15 +1,51 @@
+from __future__ import annotations
+
 import json
-from typing import Any
-import orgparse as op
-from orgparse.node import OrgNode
-from orgparse.node import OrgRootNode
+from typing import TYPE_CHECKING, Any
 import os
-import requests
-from dataclasses import dataclass
-from datetime import datetime, timedelta, date
-from dateutil.relativedelta import relativedelta
+import signal
+import threading
+import argparse
+import mmap
+import re
+import pickle
+import sqlite3
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta, date, timezone, tzinfo
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from pathlib import Path
 import itertools
+import functools
+import heapq
+import bisect
+import operator
+import contextlib
+import sys
+from time import perf_counter
+from collections.abc import Callable, Iterable, Iterator
+
+# A one-shot tick with nothing to parse or send should not pay for requests, orgparse, dateutil, asyncio and the like,
+# they're imported in the functions that need them and only named here for annotations
+if TYPE_CHECKING:
+    import asyncio
+    import random
+    import requests
+    from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+    from dateutil.relativedelta import relativedelta
+    import orgparse as op
+    from orgparse.node import OrgNode, OrgRootNode, OrgEnv
+    from orgparse.node import (
+        RE_NODE_HEADER,
+        parse_comment,
+        parse_heading_level,
+        parse_heading_priority,
+        parse_heading_tags,
+        parse_heading_todos,
+        parse_property,
+        parse_seq_todo,
+    )
+    from orgparse.date import OrgDate, OrgDateClock, parse_sdc
+    from orgparse.inline import to_plain_text
 
 
 @dataclass
@@ -19,20 +55,289 @@ class Notification:
     tags: str
     message: str
     time: datetime
+    source: str = ""
+    fire_time: datetime | None = None
+    # the notifications a digest stands for, see coalesce_notifications()
+    members: list["Notification"] = field(default_factory=list)
+
+
+@dataclass(frozen=True, slots=True)
+class Reminders:
+    """Reminder offsets set by a file, a tag or a node, None for a kind it leaves to the level above it"""
+
+    scheduled: tuple[timedelta, ...] | None = None
+    deadline: tuple[timedelta, ...] | None = None
+
+    def over(self, other: "Reminders") -> "Reminders":
+        """These reminders, with the kinds they leave open taken from `other`"""
+        return Reminders(
+            scheduled=self.scheduled if self.scheduled is not None else other.scheduled,
+            deadline=self.deadline if self.deadline is not None else other.deadline,
+        )
+
+
+DIARY_RE: re.Pattern[str] = re.compile(
+    r"<%%\((diary-[a-z]+)((?:[ \t]+[^\s()]+)*)[ \t]*\)(?:[ \t]+(\d{1,2}:\d{2})(?:-(\d{1,2}:\d{2}))?)?>"
+)
+
+
+MONTHS, DAYS, YEARS = range(1, 13), range(1, 32), range(1, 10000)
+# the diary sexps understood: how many arguments each takes at least, and the values each argument
+# can have, with whether it can be `t`
+DIARY_ARGS: dict[str, tuple[int, tuple[tuple[range, bool], ...]]] = {
+    "diary-anniversary": (2, ((MONTHS, False), (DAYS, False), (YEARS, False))),
+    "diary-cyclic": (
+        4,
+        ((range(1, 100000), False), (MONTHS, False), (DAYS, False), (YEARS, False)),
+    ),
+    "diary-block": (6, ((MONTHS, False), (DAYS, False), (YEARS, False)) * 2),
+    "diary-date": (3, ((MONTHS, True), (DAYS, True), (YEARS, True))),
+    "diary-float": (
+        3,
+        ((MONTHS, True), (range(0, 7), False), (range(-5, 6), False), (DAYS, True)),
+    ),
+}
+
+
+@dataclass(frozen=True, slots=True)
+class Diary:
+    """The diary sexps org users reach for most, in the default american date style (month day year).
+    `t` (None here) matches any value where diary-date and diary-float allow it."""
+
+    function: str
+    args: tuple[int | None, ...]
+
+    def __post_init__(self):
+        """Raises ValueError for functions or arguments matches() can't take"""
+        least, values = DIARY_ARGS.get(self.function, (1, ()))
+        if not least <= len(self.args) <= len(values) or not all(
+            y[1] if x is None else x in y[0] for x, y in zip(self.args, values)
+        ):
+            raise ValueError(f"Unsupported diary sexp: {self.function} {self.args}")
+        # the dates a cycle or block counts from must exist
+        if self.function == "diary-cyclic":
+            date(self.args[3], self.args[1], self.args[2])
+        if self.function == "diary-block":
+            date(self.args[2], self.args[0], self.args[1])
+            date(self.args[5], self.args[3], self.args[4])
+
+    def matches(self, day: date) -> bool:
+        args: tuple[int | None, ...] = self.args
+        match self.function:
+            case "diary-anniversary":
+                # month day [year], every year from `year` on
+                return (day.month, day.day) == args[:2] and (
+                    len(args) == 2 or day.year >= args[2]
+                )
+            case "diary-cyclic":
+                # every n days from month day year
+                n, month, day_of_month, year = args
+                days: int = (day - date(year, month, day_of_month)).days
+                return days >= 0 and days % n == 0
+            case "diary-block":
+                # from month day year to month day year, inclusive
+                return (
+                    date(args[2], args[0], args[1])
+                    <= day
+                    <= date(args[5], args[3], args[4])
+                )
+            case "diary-date":
+                # month day year
+                return all(
+                    x is None or x == y
+                    for x, y in zip(args, (day.month, day.day, day.year))
+                )
+            case "diary-float":
+                # the n-th dayname (0 is Sunday) of month, counted from its end when n is negative
+                month, dayname, n = args[:3]
+                if month is not None and month != day.month:
+                    return False
+                if day.isoweekday() % 7 != dayname:
+                    return False
+                if n > 0:
+                    return (day.day - 1) // 7 + 1 == n
+                return (month_days(day.year, day.month) - day.day) // 7 + 1 == -n
+        return False
+
+
+@dataclass(frozen=True, slots=True)
+class Timestamp:
+    """An active timestamp, as much of it as expanding it into occurrences needs. Times are wall clock, to the minute."""
+
+    start: datetime
+    # the end of a range, <... 10:00-11:00> or <...>--<...>, reminders are for its start
+    end: datetime | None = None
+    repeater: timedelta | relativedelta | None = None
+    # "+" and "++" repeat from the basis, ".+" from whenever the item gets done, only its basis is known
+    repeat: str = "+"
+    # the -N cookie: how long a DEADLINE warns ahead, how long a SCHEDULED item is delayed
+    warning: timedelta | relativedelta | None = None
+    # for a diary sexp, the days it occurs on, at start's time of day
+    diary: Diary | None = None
+
+    @property
+    def repeats(self) -> bool:
+        return self.repeater is not None and self.repeat != ".+"
+
+    @property
+    def single(self) -> bool:
+        """Occurs once, at start"""
+        return self.diary is None and not self.repeats
+
+    def occurrences(self, start: datetime, end: datetime) -> Iterator[datetime]:
+        """Occurrences in [start, end), lazily and in order. Series are counted from their basis arithmetically
+        and diaries day by day over the window, so the cost is the window's, not the age of the series.
+        """
+        if self.diary is not None:
+            day: date = start.date()
+            while (occurrence := datetime.combine(day, self.start.time())) < end:
+                if occurrence >= start and self.diary.matches(day):
+                    yield occurrence
+                day += timedelta(days=1)
+        elif not self.repeats:
+            if start <= self.start < end:
+                yield self.start
+        else:
+            yield from series_between(self.start, self.repeater, start, end)
+
+    def previous(self, time: datetime) -> datetime | None:
+        """The last occurrence before `time`"""
+        if self.diary is not None:
+            raise ValueError("Diary timestamps have no basis to count back to")
+        if self.start >= time:
+            return None
+        if not self.repeats:
+            return self.start
+        if isinstance(self.repeater, timedelta):
+            step: int = abs(int(self.repeater.total_seconds() // 60))
+            if step == 0:
+                return self.start
+            minutes: int = int((time - self.start).total_seconds() // 60) - 1
+            return self.start + timedelta(minutes=minutes // step * step)
+        months: int = interval_months(self.repeater)
+        if months == 0:
+            return self.start
+        return month_occurrence(
+            self.start,
+            months,
+            month_occurrence_index(self.start, months, time - timedelta(minutes=1)),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class NodeTimes:
+    """The parts of an OrgNode that matching and notifications need, cheap to keep around and to pickle.
+    This is all that caches and the daemon hold on to, OrgNode trees are dropped as soon as these are extracted.
+    """
+
+    heading: str
+    priority: str | None
+    tags: tuple[str, ...]
+    body: str
+    scheduled: Timestamp | None
+    deadline: Timestamp | None
+    # active timestamps of the heading, body and property drawer, and diary sexps
+    timestamps: tuple[Timestamp, ...]
+    # set instead of body for streamed files, the byte offset of the heading line to load the body from
+    body_offset: int | None = None
+    # the node's REMINDERS property and its file's #+REMINDERS, see ReminderTable.for_node()
+    reminders: Reminders | None = None
+    file_reminders: Reminders | None = None
+    # the node's TIMEZONE property, or its file's #+TIMEZONE, None for the configured zone
+    zone: str | None = None
 
 
 @dataclass
 class Config:
     base_dir: Path
-    reminder_intervals: list[timedelta] | None
+    # offsets per kind ("scheduled", "deadline"), a plain list sets the scheduled ones
+    reminder_intervals: dict[str, list[timedelta]] | list[timedelta] | None
     ntfy_url: str
+    cache_content_hash: bool = False
+    workers: int = 1
+    delivery_concurrency: int = 8
+    ntfy_timeout: float = 10.0
+    change_detection: str = "git"
+    ledger: bool = True
+    prescan: bool = True
+    # files of at least this many bytes are read heading by heading instead of parsed into a tree
+    stream_threshold: int = 32 * 1024 * 1024
+    # "sync" runs a tick's steps one after another, "async" overlaps them, see run_tick_async()
+    pipeline: str = "sync"
+    # bound on the files and notifications waiting between stages of the async pipeline
+    queue_size: int = 64
+    # merge a tick's notifications per "file", "priority" or "tag" into digests, None sends each on its own
+    coalesce_by: str | None = None
+    # smallest group that is merged into a digest
+    coalesce_threshold: int = 3
+    # emit one JSON line of tick stats to stderr per tick
+    metrics_log: bool = False
+    # serve the last tick's stats in Prometheus text format on this port (daemon only)
+    metrics_port: int | None = None
+    ignore_dirs: frozenset[str] = frozenset(
+        {".git", ".hg", ".svn", ".direnv", "node_modules", "__pycache__"}
+    )
+    # reminder offsets for nodes with these tags, in order of precedence
+    tag_reminders: dict[str, Reminders] = field(default_factory=dict)
+    # IANA name of the zone org timestamps are written in, None for the system's
+    timezone: str | None = None
+    # how replicas sharing the repo agree on who delivers: "flock" or "sqlite", None for a lone instance
+    coordination: str | None = None
+    # "leader": one replica runs each tick, "shard": the live replicas split the org files between them
+    coordination_mode: str = "leader"
+    # this replica's name, unique among those sharing the repo, None for the host name
+    replica: str | None = None
+    # lock file directory ("flock") or database ("sqlite") the replicas meet in, relative to base_dir
+    coordination_path: str | None = None
+    # how long an "sqlite" lease lasts without being renewed
+    lease_ttl: timedelta = timedelta(minutes=2)
+    # where parse caches are kept, None for default_cache_dir(). Not read from the repo's config,
+    # a repo naming a cache inside itself could have a pickle it committed loaded
+    cache_dir: Path | None = None
 
     def __bool__(self):
-        return bool(
-            self.base_dir.exists() and self.reminder_intervals and self.ntfy_url
+        return bool(self.base_dir.exists() and self.ntfy_url)
+
+    @property
+    def replica_name(self) -> str:
+        import socket
+
+        return self.replica if self.replica is not None else socket.gethostname()
+
+    @property
+    def cache_path(self) -> Path:
+        """Outside the repo, the cache is a pickle and loading one from the repo would run whatever it was made to.
+        Named after the repo's resolved path, so each repo has its own."""
+        import hashlib
+
+        base_dir: Path = self.base_dir.resolve()
+        name: str = (
+            f"{base_dir.name}-{hashlib.sha256(str(base_dir).encode()).hexdigest()[:16]}"
+        )
+        # sharded replicas cache different files, each keeps its own
+        if self.coordination is not None and self.coordination_mode == "shard":
+            name += f".{self.replica_name}"
+        return (self.cache_dir or default_cache_dir()) / f"{name}.pickle"
+
+    @functools.cached_property
+    def reminders(self) -> "ReminderTable":
+        """The reminder offsets compiled for matching, once per config load"""
+        return ReminderTable.compile(
+            self.reminder_intervals, self.tag_reminders, self.timezone
         )
 
 
+def default_cache_dir() -> Path:
+    """$XDG_CACHE_HOME/org-notifier, ~/.cache/org-notifier when it's unset (or relative, as the spec says to ignore)"""
+    xdg_cache_home: str = os.environ.get("XDG_CACHE_HOME", "")
+    base: Path = (
+        Path(xdg_cache_home)
+        if os.path.isabs(xdg_cache_home)
+        else Path.home() / ".cache"
+    )
+    return base / "org-notifier"
+
+
 def flatmap(list_of_lists: list[list[Any]]) -> list[Any]:
     return list(itertools.chain.from_iterable(list_of_lists))
 
@@ -51,23 +356,340 @@ def generate_deadline_notification_intervals() -> list[timedelta]:
     ]
 
 
+def generate_reminder_intervals() -> dict[str, list[timedelta]]:
+    return {
+        "scheduled": generate_scheduled_notification_intervals(),
+        "deadline": generate_deadline_notification_intervals(),
+    }
+
+
+def system_timezone() -> ZoneInfo:
+    """The system's zone, looked up by name so it pickles: $TZ, else what /etc/localtime links to, else UTC"""
+    name: str = os.environ.get("TZ", "").lstrip(":")
+    if not name:
+        _, found, name = os.path.realpath("/etc/localtime").partition("/zoneinfo/")
+        name = name if found else ""
+    try:
+        return ZoneInfo(name or "UTC")
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo("UTC")
+
+
+# UTC offsets change by at most this much around a DST transition
+DST_MARGIN: timedelta = timedelta(hours=3)
+
+
+class Zone:
+    """A time zone with its UTC offsets cached per day, converting org's wall clock times is a dict lookup
+    on all but the few days a year the offset changes. A wall time skipped by a change maps to the instant
+    it would have had before the change, a repeated one to its first instant, as zoneinfo does with fold=0.
+    """
+
+    def __init__(self, tz: tzinfo):
+        self.tz: tzinfo = tz
+        # the offset of each local or UTC day, None for the days it changes on
+        self.local_offsets: dict[date, timedelta | None] = {}
+        self.utc_offsets: dict[date, timedelta | None] = {}
+
+    def offset(self, time: datetime, utc: bool) -> timedelta:
+        aware: datetime = (
+            self.tz.fromutc(time.replace(tzinfo=self.tz))
+            if utc
+            else time.replace(tzinfo=self.tz)
+        )
+        return aware.utcoffset() or timedelta(0)
+
+    def day_offset(self, day: date, utc: bool) -> timedelta | None:
+        offsets: dict[date, timedelta | None] = (
+            self.utc_offsets if utc else self.local_offsets
+        )
+        if day not in offsets:
+            bounds: set[timedelta] = {
+                self.offset(datetime.combine(day, datetime.min.time()), utc),
+                self.offset(datetime.combine(day, datetime.max.time()), utc),
+            }
+            offsets[day] = bounds.pop() if len(bounds) == 1 else None
+        return offsets[day]
+
+    def to_utc(self, wall: datetime) -> datetime:
+        """Naive wall clock time to naive UTC"""
+        offset: timedelta | None = self.day_offset(wall.date(), utc=False)
+        return wall - (offset if offset is not None else self.offset(wall, utc=False))
+
+    def to_local(self, utc: datetime) -> datetime:
+        """Naive UTC to naive wall clock time"""
+        offset: timedelta | None = self.day_offset(utc.date(), utc=True)
+        return utc + (offset if offset is not None else self.offset(utc, utc=True))
+
+    def walls(self, utc: datetime) -> list[datetime]:
+        """Every wall time to_utc() maps to the instant: none for the second pass of a repeated hour,
+        two for an instant just after a skipped hour"""
+        offsets: set[timedelta] = {
+            self.offset(utc + x, utc=True)
+            for x in (-DST_MARGIN, timedelta(0), DST_MARGIN)
+        }
+        return sorted(
+            wall for wall in (utc + x for x in offsets) if self.to_utc(wall) == utc
+        )
+
+    def aware(self, wall: datetime) -> datetime:
+        return wall.replace(tzinfo=self.tz)
+
+
+@functools.cache
+def get_zone(name: str | None) -> Zone:
+    """The zone named `name` (None for the system's), raises ValueError for unknown names"""
+    try:
+        return Zone(ZoneInfo(name) if name is not None else system_timezone())
+    except (ZoneInfoNotFoundError, ValueError) as e:
+        raise ValueError(f"Unknown time zone {name!r}") from e
+
+
+def parse_org_zone(values: list[str], where: str) -> str | None:
+    """The zone of #+TIMEZONE lines or a TIMEZONE property, later lines win. Unknown zones are reported and ignored."""
+    zone: str | None = None
+    for value in values:
+        try:
+            get_zone(value.strip())
+        except ValueError as e:
+            print(f"Ignoring TIMEZONE in {where}: {e}")
+            continue
+        zone = value.strip()
+    return zone
+
+
+DURATION_RE: re.Pattern[str] = re.compile(r"(\d+)([mhdw]?)")
+DURATION_UNITS: dict[str, timedelta] = {
+    "": timedelta(minutes=1),
+    "m": timedelta(minutes=1),
+    "h": timedelta(hours=1),
+    "d": timedelta(days=1),
+    "w": timedelta(weeks=1),
+}
+
+
+def parse_duration(value: str | int | timedelta) -> timedelta:
+    """A reminder offset: a timedelta (cut to whole minutes), minutes as an int, or a string like 15m, 6h, 1d, 2w"""
+    if isinstance(value, timedelta):
+        return value // timedelta(minutes=1) * timedelta(minutes=1)
+    if isinstance(value, int):
+        return timedelta(minutes=value)
+    match: re.Match[str] | None = DURATION_RE.fullmatch(value.strip())
+    if match is None:
+        raise ValueError(f"Invalid reminder offset {value!r}")
+    return int(match.group(1)) * DURATION_UNITS[match.group(2)]
+
+
+def parse_reminders(value: str | list | dict) -> Reminders:
+    """Reminders from config JSON (a list of offsets, or lists per kind) or from org text.
+    In org text, "0 15m 1h" sets the offsets of both kinds, "scheduled=0,15m deadline=1d,2d" sets them per kind.
+    """
+    if isinstance(value, dict):
+        unknown: set[str] = set(value) - {"scheduled", "deadline"}
+        if unknown:
+            raise ValueError(f"Unknown reminder kinds {sorted(unknown)}")
+        return Reminders(
+            **{
+                kind: tuple(sorted(set(map(parse_duration, offsets))))
+                for kind, offsets in value.items()
+            }
+        )
+    if isinstance(value, list):
+        return parse_reminders({"scheduled": value})
+    words: list[str] = value.replace(",", " ").split()
+    if not any("=" in x for x in value.split()):
+        offsets: tuple[timedelta, ...] = tuple(sorted(set(map(parse_duration, words))))
+        return Reminders(scheduled=offsets, deadline=offsets)
+    per_kind: dict[str, list[str]] = {}
+    for part in value.split():
+        kind, _, offsets_text = part.partition("=")
+        per_kind[kind.lower()] = [x for x in offsets_text.split(",") if x]
+    return parse_reminders(per_kind)
+
+
+def parse_org_reminders(values: list[str], where: str) -> Reminders | None:
+    """Reminders from #+REMINDERS lines or a REMINDERS property, later lines win. Invalid ones are reported and ignored."""
+    reminders: Reminders | None = None
+    for value in values:
+        try:
+            parsed: Reminders = parse_reminders(value)
+        except ValueError as e:
+            print(f"Ignoring REMINDERS in {where}: {e}")
+            continue
+        reminders = parsed if reminders is None else parsed.over(reminders)
+    return reminders
+
+
+@dataclass(frozen=True)
+class ReminderTable:
+    """Reminder offsets compiled once per config load: the repo's offsets per kind and the per-tag overrides.
+    A node resolves its offsets as its REMINDERS property, then its first configured tag, then its file's
+    #+REMINDERS, then the repo's, kind by kind. Resolutions are memoized, nodes sharing settings share one.
+    """
+
+    scheduled: tuple[timedelta, ...]
+    deadline: tuple[timedelta, ...]
+    tags: tuple[tuple[str, Reminders], ...] = ()
+    # the zone of naive times and of nodes that don't set one, None for the system's
+    timezone: str | None = None
+    resolved: dict[
+        tuple[Any, ...], tuple[tuple[timedelta, ...], tuple[timedelta, ...]]
+    ] = field(default_factory=dict, compare=False, repr=False)
+
+    @classmethod
+    def compile(
+        cls,
+        reminder_intervals: "ReminderIntervals | list[timedelta] | None",
+        tag_reminders: dict[str, Reminders] | None = None,
+        timezone: str | None = None,
+    ) -> "ReminderTable":
+        if isinstance(reminder_intervals, ReminderTable):
+            return reminder_intervals
+        defaults: dict[str, list[timedelta]] = generate_reminder_intervals()
+        repo: Reminders = parse_reminders(reminder_intervals or {}).over(
+            Reminders(
+                scheduled=tuple(defaults["scheduled"]),
+                deadline=tuple(defaults["deadline"]),
+            )
+        )
+        return cls(
+            scheduled=repo.scheduled,
+            deadline=repo.deadline,
+            tags=tuple((tag_reminders or {}).items()),
+            timezone=timezone,
+        )
+
+    def for_node(
+        self, node: NodeTimes
+    ) -> tuple[tuple[timedelta, ...], tuple[timedelta, ...]]:
+        """(scheduled offsets, deadline offsets) for the node"""
+        tag_key: tuple[str, ...] = node.tags if self.tags else ()
+        key: tuple[Any, ...] = (node.reminders, node.file_reminders, tag_key)
+        offsets = self.resolved.get(key)
+        if offsets is None:
+            reminders: Reminders = Reminders(self.scheduled, self.deadline)
+            if node.file_reminders is not None:
+                reminders = node.file_reminders.over(reminders)
+            tag_reminders: Reminders | None = next(
+                (x[1] for x in self.tags if x[0] in tag_key), None
+            )
+            if tag_reminders is not None:
+                reminders = tag_reminders.over(reminders)
+            if node.reminders is not None:
+                reminders = node.reminders.over(reminders)
+            offsets = self.resolved[key] = (reminders.scheduled, reminders.deadline)
+        return offsets
+
+    @property
+    def zone(self) -> Zone:
+        return get_zone(self.timezone)
+
+    def zone_for(self, node: NodeTimes) -> Zone:
+        return get_zone(node.zone or self.timezone)
+
+    def utc(self, time: datetime) -> datetime:
+        """`time` as aware UTC, a naive `time` is wall clock time in the table's zone"""
+        if time.tzinfo is not None:
+            return time.astimezone(timezone.utc)
+        return self.zone.to_utc(time).replace(tzinfo=timezone.utc)
+
+    def instant(self, time: datetime) -> datetime:
+        """The minute of `time` as naive UTC, as schedules keep them"""
+        return floor_minute(self.utc(time)).replace(tzinfo=None)
+
+    def offsets(self) -> list[timedelta]:
+        """Every offset the config can give a node, files and nodes may add their own"""
+        return [
+            *self.scheduled,
+            *self.deadline,
+            *flatmap(
+                [(x[1].scheduled or ()) + (x[1].deadline or ()) for x in self.tags]
+            ),
+        ]
+
+
+# the repo defaults as a dict per kind, or a compiled table
+ReminderIntervals = ReminderTable | dict[str, list[timedelta]]
+
+
+NTFY_TIMEOUT: float = 10.0
+
+
+def create_session(pool_size: int) -> requests.Session:
+    """Session whose connection pool can keep one connection per concurrent delivery alive"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session: requests.Session = requests.Session()
+    adapter: HTTPAdapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class LazySession:
+    """Stands in for create_session(pool_size) until the first post, a tick with nothing to send never imports requests"""
+
+    def __init__(self, pool_size: int):
+        self.pool_size: int = pool_size
+        self.session: requests.Session | None = None
+        self.lock: threading.Lock = threading.Lock()
+
+    def post(self, *args, **kwargs) -> requests.Response:
+        with self.lock:
+            if self.session is None:
+                self.session = create_session(self.pool_size)
+        return self.session.post(*args, **kwargs)
+
+    def close(self) -> None:
+        if self.session is not None:
+            self.session.close()
+
+    def __enter__(self) -> LazySession:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def time_until(event: datetime, time: datetime) -> str:
+    # either may be naive, taken as the system's local time
+    minutes_until: int = int(
+        (event.astimezone(timezone.utc) - time.astimezone(timezone.utc)).total_seconds()
+        // 60
+    )
+    return f"(in {abs(minutes_until)} minutes)" if minutes_until > 1 else "(now)"
+
+
 def send_ntfy(
-    notification: Notification, url: str, time: datetime
+    notification: Notification,
+    url: str,
+    time: datetime,
+    session: requests.Session | None = None,
+    timeout: float = NTFY_TIMEOUT,
 ) -> requests.Response:
-    minutes_until: int = int((notification.time - time).total_seconds() // 60)
-    resp: requests.Response = requests.post(
+    import requests
+
+    post = session.post if session is not None else requests.post
+    resp: requests.Response = post(
         url,
         data=notification.message,
         headers={
-            "Title": f"{notification.title} {f'(in {abs(minutes_until)} minutes)' if minutes_until > 1 else '(now)'}",
+            "Title": f"{notification.title} {time_until(notification.time, time)}",
             "Priority": notification.priority,
             "Tags": notification.tags,
         },
+        timeout=timeout,
     )
     return resp
 
 
-def generate_notification(node: OrgNode, time: datetime) -> Notification:
+def generate_notification(
+    node: NodeTimes,
+    time: datetime,
+    source: str = "",
+    fire_time: datetime | None = None,
+) -> Notification:
     priority_map: dict[str | None, str] = {"A": "urgent", None: "default"}
     return Notification(
         title=node.heading,
@@ -75,24 +697,617 @@ def generate_notification(node: OrgNode, time: datetime) -> Notification:
         tags=",".join(node.tags),
         message=node.body if node.body.strip() else node.heading,
         time=time,
+        source=source,
+        fire_time=fire_time,
+    )
+
+
+COALESCE_KEYS: dict[str, Callable[[Notification], str]] = {
+    "file": lambda x: x.source,
+    "priority": lambda x: x.priority,
+}
+
+
+def most_shared_tag(notifications: list[Notification]) -> Callable[[Notification], str]:
+    """Key each notification on the one of its tags most of `notifications` share, the first in
+    alphabetical order on a tie, so `:work:` and `:home:work:` end up in the same digest.
+    """
+    counts: dict[str, int] = {}
+    for tag in (y for x in notifications for y in x.tags.split(",") if y):
+        counts[tag] = counts.get(tag, 0) + 1
+    return lambda x: min(x.tags.split(","), key=lambda y: (-counts.get(y, 0), y))
+
+
+def coalesce_notifications(
+    notifications: list[Notification],
+    time: datetime,
+    by: str | None,
+    threshold: int,
+) -> list[Notification]:
+    """Merge each group (by file, priority or tag) of at least `threshold` notifications into one digest.
+    Urgent notifications are always delivered on their own. A digest keeps its notifications in `members`.
+    By tag, a notification with several tags goes in one digest only, see most_shared_tag().
+    """
+    if by is None:
+        return notifications
+    candidates: list[Notification] = [
+        x for x in notifications if x.priority != "urgent"
+    ]
+    key: Callable[[Notification], str] = (
+        most_shared_tag(candidates) if by == "tag" else COALESCE_KEYS[by]
     )
+    groups: dict[str, list[Notification]] = {}
+    for notification in candidates:
+        groups.setdefault(key(notification), []).append(notification)
+    digests: dict[int, Notification] = {}
+    merged: set[int] = set()
+    for key, group in groups.items():
+        if len(group) < threshold:
+            continue
+        merged |= set(map(id, group))
+        digests[id(group[0])] = Notification(
+            title=f"{len(group)} reminders"
+            + (f": {Path(key).stem if by == 'file' else key}" if key else ""),
+            priority=group[0].priority if by == "priority" else "default",
+            tags=",".join(sorted({y for x in group for y in x.tags.split(",") if y})),
+            message="\n".join(f"{x.title} {time_until(x.time, time)}" for x in group),
+            time=min(x.time for x in group),
+            source=group[0].source if by == "file" else "",
+            fire_time=group[0].fire_time,
+            members=group,
+        )
+    # a digest goes out where its first notification would have
+    return [
+        digests[id(x)] if id(x) in digests else x
+        for x in notifications
+        if id(x) not in merged or id(x) in digests
+    ]
+
+
+def expand_digests(notifications: list[Notification]) -> list[Notification]:
+    return flatmap([x.members or [x] for x in notifications])
 
 
 def send_notification(
-    node: Notification, url: str, time: datetime
+    node: Notification,
+    url: str,
+    time: datetime,
+    session: requests.Session | None = None,
+    timeout: float = NTFY_TIMEOUT,
 ) -> requests.Response:
-    resp = send_ntfy(notification=node, url=url, time=time)
+    resp = send_ntfy(
+        notification=node, url=url, time=time, session=session, timeout=timeout
+    )
     return resp
 
 
+# consecutive failed deliveries that open the circuit breaker
+BREAKER_THRESHOLD: int = 5
+# how long an open breaker holds back deliveries before letting a probe through
+BREAKER_COOLDOWN: timedelta = timedelta(minutes=2)
+
+
+class CircuitBreaker:
+    """Stops sending to an ntfy server that keeps failing, so a dead server doesn't cost a timeout per notification.
+    After the cooldown a single probe is let through: success closes the breaker, failure opens it again.
+    Safe to share between delivery threads.
+    """
+
+    def __init__(
+        self,
+        failures: int = 0,
+        open_until: datetime | None = None,
+        threshold: int = BREAKER_THRESHOLD,
+        cooldown: timedelta = BREAKER_COOLDOWN,
+    ):
+        self.failures: int = failures
+        self.open_until: datetime | None = open_until
+        self.threshold: int = threshold
+        self.cooldown: timedelta = cooldown
+        self.probing: bool = False
+        # what the breaker kept from being sent, never attempted so not counted as a failure
+        self.held_back: list[Notification] = []
+        self.lock: threading.Lock = threading.Lock()
+
+    def allow(self, time: datetime) -> bool:
+        with self.lock:
+            if self.failures < self.threshold:
+                return True
+            if self.probing or (self.open_until is not None and time < self.open_until):
+                return False
+            self.probing = True
+            return True
+
+    def hold(self, notification: Notification) -> None:
+        with self.lock:
+            self.held_back.append(notification)
+
+    def record(self, ok: bool, time: datetime) -> None:
+        with self.lock:
+            self.probing = False
+            if ok:
+                self.failures, self.open_until = 0, None
+                return
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.open_until = time + self.cooldown
+
+
+def is_retryable(response: requests.Response | None) -> bool:
+    """Network errors, rate limiting and server errors are worth retrying, other client errors are not"""
+    return (
+        response is None or response.status_code == 429 or response.status_code >= 500
+    )
+
+
+def deliver_notification(
+    notification: Notification,
+    url: str,
+    time: datetime,
+    session: requests.Session,
+    timeout: float = NTFY_TIMEOUT,
+    breaker: CircuitBreaker | None = None,
+) -> tuple[Notification, requests.Response | None]:
+    import requests
+
+    if breaker is not None and not breaker.allow(time):
+        breaker.hold(notification)
+        return notification, None
+    try:
+        response: requests.Response | None = send_notification(
+            notification, url, time, session=session, timeout=timeout
+        )
+    except requests.RequestException as e:
+        print(f"Failed to send notification {notification.title!r}: {e}")
+        response = None
+    if breaker is not None:
+        breaker.record(not is_retryable(response), time)
+    return notification, response
+
+
+def deliver_notifications(
+    notifications: list[Notification],
+    url: str,
+    time: datetime,
+    session: requests.Session,
+    concurrency: int,
+    timeout: float = NTFY_TIMEOUT,
+    breaker: CircuitBreaker | None = None,
+) -> list[tuple[Notification, requests.Response | None]]:
+    """Deliver concurrently, at most `concurrency` requests in flight.
+    Failed deliveries, and those held back by an open breaker, are paired with None."""
+    if not notifications:
+        return []
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(concurrency, len(notifications)))
+    ) as executor:
+        return list(
+            executor.map(
+                lambda x: deliver_notification(x, url, time, session, timeout, breaker),
+                notifications,
+            )
+        )
+
+
+@functools.cache
+def load_orgparse() -> None:
+    """Import the parts of orgparse the parsers use into the module, once. Every function that needs them
+    at run time calls this first, names rather than local imports as the streaming parser looks them up for every line.
+    """
+    global op, OrgNode, OrgRootNode, OrgEnv, OrgDate, OrgDateClock, parse_sdc
+    global RE_NODE_HEADER, parse_comment, parse_property, parse_seq_todo, to_plain_text
+    global parse_heading_level, parse_heading_priority, parse_heading_tags, parse_heading_todos
+    import orgparse as op
+    from orgparse.node import OrgNode, OrgRootNode, OrgEnv
+    from orgparse.node import (
+        RE_NODE_HEADER,
+        parse_comment,
+        parse_heading_level,
+        parse_heading_priority,
+        parse_heading_tags,
+        parse_heading_todos,
+        parse_property,
+        parse_seq_todo,
+    )
+    from orgparse.date import OrgDate, OrgDateClock, parse_sdc
+    from orgparse.inline import to_plain_text
+
+
 def parse_file(path: Path) -> OrgRootNode:
+    load_orgparse()
     org_tree_root: OrgRootNode = op.load(path)
     return org_tree_root
 
 
-def parse_string(orgstr: str) -> OrgRootNode:
-    org_tree_root: OrgRootNode = op.loads(orgstr)
-    return org_tree_root
+# files at least this large are read heading by heading instead of being parsed into a tree
+STREAM_THRESHOLD: int = 32 * 1024 * 1024
+# bump whenever NodeTimes, CachedFile or ScheduleIndex change shape
+CACHE_VERSION: int = 12
+
+
+@dataclass(slots=True)
+class CachedFile:
+    mtime_ns: int
+    size: int
+    digest: str | None
+    nodes: list[NodeTimes]
+    # an index per reminder table, tenants sharing the repo can have different ones
+    schedules: dict[ReminderTable, ScheduleIndex] = field(default_factory=dict)
+    # set when the pre-scan found nothing that can fire before this time (naive UTC), the file was not parsed and nodes is empty
+    skipped_until: datetime | None = None
+
+
+PRESCAN_TIMESTAMP_RE: re.Pattern[bytes] = re.compile(rb"<(\d{4}-\d{2}-\d{2})([^>\n]*)>")
+PRESCAN_COOKIE_RE: re.Pattern[bytes] = re.compile(rb"(?:[.+]{1,2}|-)(\d+)([hdwmy])")
+PRESCAN_REMINDERS_RE: re.Pattern[bytes] = re.compile(rb"(?i)(?:#\+|:)reminders:")
+PRESCAN_DIARY_RE: re.Pattern[bytes] = re.compile(rb"<%%\(")
+
+
+def prescan_could_fire(
+    content: bytes | mmap.mmap,
+    start: datetime,
+    end: datetime,
+    reminder_intervals: ReminderIntervals,
+) -> bool:
+    """Cheap check over the raw bytes for an active timestamp that could fire in [start, end).
+    Errs on the side of True: timestamps count as whole days, repeaters and warnings as series from their basis,
+    and DONE states, inactive trees or timestamps orgparse wouldn't parse are not considered.
+    Files setting their own REMINDERS or with diary sexps are always parsed, as are timestamps with both
+    a repeater and a warning or delay. Days are widened by one either way, a wall clock date in any zone
+    is within a day of the UTC one.
+    """
+    if PRESCAN_REMINDERS_RE.search(content) or PRESCAN_DIARY_RE.search(content):
+        return True
+    table: ReminderTable = ReminderTable.compile(reminder_intervals)
+    offsets: list[timedelta] = table.offsets()
+    if not offsets:
+        return False
+    first_day: date = (table.instant(start) + min(offsets)).date() - timedelta(days=1)
+    last_day: date = (table.instant(end) + max(offsets)).date() + timedelta(days=1)
+    first_key: bytes = first_day.isoformat().encode()
+    last_key: bytes = last_day.isoformat().encode()
+    window_start: datetime = datetime.combine(first_day, datetime.min.time())
+    window_end: datetime = datetime.combine(last_day, datetime.min.time()) + timedelta(
+        days=1
+    )
+    for match in PRESCAN_TIMESTAMP_RE.finditer(content):
+        # ISO dates compare the same as bytes and as dates
+        day: bytes = match.group(1)
+        if first_key <= day <= last_key:
+            return True
+        if day > last_key:
+            continue
+        cookies: list[tuple[bytes, bytes]] = PRESCAN_COOKIE_RE.findall(match.group(2))
+        if len(cookies) > 1:
+            # a warning or delay counts from each occurrence, not the basis
+            return True
+        for count, unit in cookies:
+            try:
+                basis: datetime = datetime.strptime(day.decode(), "%Y-%m-%d")
+            except ValueError:
+                return True
+            interval: timedelta | relativedelta = repeater_to_interval(
+                ("+", int(count), unit.decode())
+            )
+            # a whole day either side of the window covers the timestamp's time of day
+            if (
+                next(
+                    series_between(
+                        basis, interval, window_start - timedelta(days=1), window_end
+                    ),
+                    None,
+                )
+                is not None
+            ):
+                return True
+    return False
+
+
+def content_digest(content: bytes | mmap.mmap) -> str:
+    import hashlib
+
+    return hashlib.sha256(content).hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    import hashlib
+
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def process_pool(workers: int) -> ProcessPoolExecutor:
+    """A pool for parsing that doesn't fork: it's created from tenant threads while the metrics server
+    (and other tenants) run, a forked child would inherit their locks in whatever state they're in.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    method: str = (
+        "forkserver"
+        if "forkserver" in multiprocessing.get_all_start_methods()
+        else "spawn"
+    )
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context(method)
+    )
+
+
+def parse_cached_file(
+    path: Path,
+    use_hash: bool = False,
+    time: datetime | None = None,
+    reminder_intervals: ReminderIntervals | None = None,
+    prescan: bool = False,
+    stream_threshold: int = STREAM_THRESHOLD,
+) -> CachedFile:
+    """Parse a file into a cache entry, with its schedule index already built when a time is given.
+    With prescan (needs a time), a file that can't fire within the schedule horizon is not parsed at all.
+    Files of at least stream_threshold bytes are streamed, their records keep no bodies.
+    """
+    stat: os.stat_result = path.stat()
+    if reminder_intervals is not None:
+        reminder_intervals = ReminderTable.compile(reminder_intervals)
+    if prescan and time is not None and reminder_intervals is not None:
+        # naive UTC, as the schedule index keeps them
+        start: datetime = reminder_intervals.instant(time)
+        end: datetime = start + SCHEDULE_HORIZON
+        with open(path, "rb") as f:
+            # mapped rather than read, most files are skipped and never need to be copied into memory
+            mapped: mmap.mmap | bytes = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if stat.st_size
+                else b""
+            )
+            try:
+                if not prescan_could_fire(
+                    mapped,
+                    start.replace(tzinfo=timezone.utc),
+                    end.replace(tzinfo=timezone.utc),
+                    reminder_intervals,
+                ):
+                    return CachedFile(
+                        mtime_ns=stat.st_mtime_ns,
+                        size=stat.st_size,
+                        digest=content_digest(mapped) if use_hash else None,
+                        nodes=[],
+                        schedules={
+                            reminder_intervals: ScheduleIndex(
+                                start=start,
+                                end=end,
+                                reminder_intervals=reminder_intervals,
+                                fire_times=[],
+                                entries=[],
+                            )
+                        },
+                        skipped_until=end,
+                    )
+            finally:
+                if isinstance(mapped, mmap.mmap):
+                    mapped.close()
+    if stat.st_size >= stream_threshold:
+        nodes: list[NodeTimes] = list(stream_node_times(path))
+        digest: str | None = file_digest(path) if use_hash else None
+    else:
+        load_orgparse()
+        content: bytes = path.read_bytes()
+        nodes = get_timed_nodes(op.loads(content.decode("utf8"), filename=path.name))
+        digest = content_digest(content) if use_hash else None
+    return CachedFile(
+        mtime_ns=stat.st_mtime_ns,
+        size=stat.st_size,
+        digest=digest,
+        nodes=nodes,
+        schedules=(
+            {
+                reminder_intervals: build_schedule(
+                    nodes=nodes,
+                    start=floor_minute(time),
+                    reminder_intervals=reminder_intervals,
+                )
+            }
+            if time is not None and reminder_intervals is not None
+            else {}
+        ),
+    )
+
+
+@dataclass
+class ScanState:
+    git_head: str | None
+    files: list[Path]
+    full_scan_at: datetime
+
+
+class ParseCache:
+    """Parsed org files keyed on path, reused while the file's mtime and size are unchanged.
+    With use_hash, a file whose stat changed but whose content did not (e.g. a git checkout) is reused as well.
+    """
+
+    def __init__(
+        self,
+        use_hash: bool = False,
+        prescan: bool = False,
+        stream_threshold: int = STREAM_THRESHOLD,
+    ):
+        self.use_hash: bool = use_hash
+        self.prescan: bool = prescan
+        self.stream_threshold: int = stream_threshold
+        self.entries: dict[Path, CachedFile] = {}
+        self.scan_state: ScanState | None = None
+        # files already known to be current for this tick, see refresh()
+        self.fresh: set[Path] = set()
+        self.dirty: bool = False
+        # files parsed over the cache's lifetime, run_tick() reports the per-tick difference
+        self.parsed: int = 0
+
+    def lookup(self, path: Path) -> CachedFile | None:
+        """The cached entry if it is still valid for the file on disk"""
+        entry: CachedFile | None = self.entries.get(path)
+        if entry is None:
+            return None
+        if path in self.fresh:
+            return entry
+        stat: os.stat_result = path.stat()
+        if entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+            return entry
+        if entry.digest is not None and self.use_hash:
+            if content_digest(path.read_bytes()) == entry.digest:
+                entry.mtime_ns, entry.size = stat.st_mtime_ns, stat.st_size
+                self.dirty = True
+                return entry
+        return None
+
+    def get(self, path: Path) -> CachedFile:
+        entry: CachedFile | None = self.lookup(path)
+        if entry is None or entry.skipped_until is not None:
+            entry = parse_cached_file(
+                path=path,
+                use_hash=self.use_hash,
+                stream_threshold=self.stream_threshold,
+            )
+            self.parsed += 1
+            self.entries[path] = entry
+            self.dirty = True
+        return entry
+
+    def refresh(
+        self,
+        paths: list[Path],
+        time: datetime,
+        reminder_intervals: ReminderIntervals,
+        workers: int = 1,
+    ) -> None:
+        """Check every file once for this tick and parse the changed ones up front, over a process pool when workers > 1.
+        Workers send back entries (node records and their schedule), never OrgNode trees.
+        """
+        self.fresh = set()
+        stale: list[Path] = []
+        for path in paths:
+            if self.lookup(path) is None:
+                stale.append(path)
+            else:
+                self.fresh.add(path)
+        if workers <= 1 or len(stale) <= 1:
+            return
+        with process_pool(workers) as executor:
+            entries: Iterator[CachedFile] = executor.map(
+                parse_cached_file,
+                stale,
+                itertools.repeat(self.use_hash),
+                itertools.repeat(time),
+                itertools.repeat(reminder_intervals),
+                itertools.repeat(self.prescan),
+                itertools.repeat(self.stream_threshold),
+                chunksize=max(1, len(stale) // (workers * 4)),
+            )
+            for path, entry in zip(stale, entries):
+                self.store(path, entry)
+
+    def store(self, path: Path, entry: CachedFile) -> None:
+        """Install an entry parsed elsewhere (e.g. in a worker process) as current for this tick"""
+        self.entries[path] = entry
+        self.fresh.add(path)
+        self.parsed += 1
+        self.dirty = True
+
+    def prune(self, paths: list[Path]) -> None:
+        """Forget files that no longer exist"""
+        keep: set[Path] = set(paths)
+        for path in [x for x in self.entries if x not in keep]:
+            del self.entries[path]
+            self.dirty = True
+
+    def schedule(
+        self,
+        path: Path,
+        time: datetime,
+        reminder_intervals: ReminderIntervals,
+        since: datetime | None = None,
+    ) -> "ScheduleIndex":
+        """The file's schedule index, rebuilt when the file changed, [since, time] left its horizon or the reminders changed"""
+        reminder_intervals = ReminderTable.compile(reminder_intervals)
+        start: datetime = floor_minute(
+            reminder_intervals.utc(time if since is None else min(since, time))
+        )
+        entry: CachedFile | None = self.lookup(path)
+        if entry is None:
+            entry = parse_cached_file(
+                path=path,
+                use_hash=self.use_hash,
+                time=start,
+                reminder_intervals=reminder_intervals,
+                prescan=self.prescan,
+                stream_threshold=self.stream_threshold,
+            )
+            self.entries[path] = entry
+            self.parsed += 1
+            self.dirty = True
+        schedule: ScheduleIndex | None = entry.schedules.get(reminder_intervals)
+        if schedule is None or not schedule.covers(start) or not schedule.covers(time):
+            if entry.skipped_until is not None:
+                # only known not to fire up to skipped_until, scan again for the new window,
+                # the other tables' indexes still hold for the unchanged file
+                schedules: dict[ReminderTable, ScheduleIndex] = entry.schedules
+                entry = parse_cached_file(
+                    path=path,
+                    use_hash=self.use_hash,
+                    time=start,
+                    reminder_intervals=reminder_intervals,
+                    prescan=self.prescan,
+                    stream_threshold=self.stream_threshold,
+                )
+                entry.schedules = {**schedules, **entry.schedules}
+                self.entries[path] = entry
+                self.parsed += 1
+            else:
+                entry.schedules[reminder_intervals] = build_schedule(
+                    nodes=entry.nodes,
+                    start=start,
+                    reminder_intervals=reminder_intervals,
+                )
+            self.dirty = True
+        return entry.schedules[reminder_intervals]
+
+    @classmethod
+    def load(
+        cls,
+        path: Path,
+        use_hash: bool = False,
+        prescan: bool = False,
+        stream_threshold: int = STREAM_THRESHOLD,
+    ) -> "ParseCache":
+        cache: ParseCache = cls(
+            use_hash=use_hash, prescan=prescan, stream_threshold=stream_threshold
+        )
+        try:
+            with open(path, "rb") as f:
+                stored: Any = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return cache
+        if (
+            isinstance(stored, tuple)
+            and len(stored) == 3
+            and stored[0] == CACHE_VERSION
+            and isinstance(stored[1], dict)
+        ):
+            cache.entries = stored[1]
+            cache.scan_state = stored[2]
+        return cache
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path: Path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(
+                (CACHE_VERSION, self.entries, self.scan_state),
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp_path, path)
+        self.dirty = False
 
 
 def coerce_datetime(d: date | datetime):
@@ -104,6 +1319,8 @@ def coerce_datetime(d: date | datetime):
 
 
 def repeater_to_interval(repeater: tuple[str, int, str]) -> timedelta | relativedelta:
+    from dateutil.relativedelta import relativedelta
+
     interval_value: int = repeater[1]
     interval: str = repeater[2]
     match interval.lower():
@@ -123,266 +1340,2604 @@ def repeater_to_interval(repeater: tuple[str, int, str]) -> timedelta | relative
             )
 
 
-def is_in_series(
-    series_basis: datetime,
-    interval: timedelta | relativedelta,
-    check_dates: list[datetime],
-) -> bool:
-    # Normalize times by removing seconds and microseconds
-    series_basis = series_basis.replace(second=0, microsecond=0)
-    check_dates = [d.replace(second=0, microsecond=0) for d in check_dates]
+def interval_months(interval: relativedelta) -> int:
+    """Length of a year/month interval in months. The sign is dropped, series are always counted forward from their basis."""
+    if any(
+        (
+            interval.weeks,
+            interval.days,
+            interval.hours,
+            interval.minutes,
+            interval.seconds,
+            interval.microseconds,
+        )
+    ):
+        raise ValueError(f"Only year and month intervals are supported: {interval}")
+    return abs(interval.years * 12 + interval.months)
 
-    if isinstance(interval, timedelta):
-        # Convert to minutes for integer arithmetic
-        interval_minutes = int(interval.total_seconds() // 60)
 
-        for check_date in check_dates:
-            # Calculate time difference in minutes
-            diff = check_date - series_basis
-            diff_minutes = int(diff.total_seconds() // 60)
+MONTH_DAYS: tuple[int, ...] = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
 
-            # Skip negative differences
-            if diff_minutes < 0:
-                continue
 
-            # Check if it's an exact multiple
-            if diff_minutes % interval_minutes == 0:
-                return True
+def month_days(year: int, month: int) -> int:
+    leap: bool = year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+    return 29 if month == 2 and leap else MONTH_DAYS[month - 1]
 
-        return False
-    else:
-        # For relativedelta, precompute a reasonable number of occurrences
-        # This is still faster than the original while loop approach
-        occurrences: set[datetime] = set()
-        current = series_basis
 
-        # Calculate max difference to determine how many iterations we need
-        max_check_date = max(check_dates)
+def month_occurrence(series_basis: datetime, months: int, n: int) -> datetime:
+    # computed from the basis every time, so a day-of-month clamped in a short month (Jan 31 -> Feb 28) doesn't carry over
+    # the same as adding relativedelta(months=n * months), without importing dateutil on the matching path
+    total: int = series_basis.month - 1 + n * months
+    year: int = series_basis.year + total // 12
+    month: int = total % 12 + 1
+    return series_basis.replace(
+        year=year, month=month, day=min(series_basis.day, month_days(year, month))
+    )
+
 
-        while current <= max_check_date:
-            occurrences.add(current)
-            current += interval
+def month_occurrence_index(series_basis: datetime, months: int, time: datetime) -> int:
+    """Index of the last occurrence at or before `time`, negative if `time` is before the basis"""
+    month_diff: int = (time.year - series_basis.year) * 12 + (
+        time.month - series_basis.month
+    )
+    n: int = month_diff // months
+    if month_occurrence(series_basis, months, n) > time:
+        n -= 1
+    return n
 
-        # Check if any of our check_dates are in the occurrences
-        return any(d in occurrences for d in check_dates)
 
+def org_timestamp(d: OrgDate) -> Timestamp:
+    def interval(
+        repeater: tuple[str, int, str] | None,
+    ) -> timedelta | relativedelta | None:
+        return None if repeater is None else repeater_to_interval(repeater)
 
-def get_valid_nodes(node: OrgRootNode) -> list[OrgNode]:
-    org_nodes: list[OrgNode] = list(node[1:])
-    valid_nodes: list[OrgNode] = list(
-        filter(lambda x: x.heading.strip() != "", org_nodes)
+    return Timestamp(
+        start=floor_minute(coerce_datetime(d.start)),
+        end=None if d.end is None else floor_minute(coerce_datetime(d.end)),
+        repeater=interval(d._repeater),
+        repeat="+" if d._repeater is None else d._repeater[0],
+        warning=interval(d._warning),
     )
-    return valid_nodes
 
 
-def node_and_time_for_notification(
-    time: datetime, node: OrgRootNode, reminder_intervals: dict[str, list[timedelta]]
-) -> list[tuple[OrgNode, datetime]]:
-    """The reason we return a list of tuples here instead of just the node is because the generate notification function needs a time in the notification"""
-    valid_nodes: list[OrgNode] = get_valid_nodes(node)
-    scheduled_notification_precise_times: list[datetime] = list(
-        map(lambda x: time + x, reminder_intervals["scheduled"])
+def clock_time(value: str | None) -> datetime | None:
+    """A diary sexp's HH:MM, on the epoch's date"""
+    if value is None:
+        return None
+    hour, minute = value.split(":")
+    return EPOCH.replace(hour=int(hour), minute=int(minute))
+
+
+def parse_diaries(text: str, where: str) -> list[Timestamp]:
+    """The diary sexps in `text` as timestamps, unsupported ones are printed and ignored"""
+    diaries: list[Timestamp] = []
+    for match in DIARY_RE.finditer(text):
+        function, args, start, end = match.groups()
+        try:
+            diary: Diary = Diary(
+                function, tuple(None if x == "t" else int(x) for x in args.split())
+            )
+            start_time, end_time = clock_time(start), clock_time(end)
+        except ValueError as e:
+            print(f"Ignoring {match.group(0)} in {where}: {e}")
+            continue
+        diaries.append(Timestamp(start=start_time or EPOCH, end=end_time, diary=diary))
+    return diaries
+
+
+def active_dates(text: str) -> list[OrgDate]:
+    load_orgparse()
+    return [x for x in OrgDate.list_from_str(text) if x.is_active()]
+
+
+def build_node_times(
+    heading: str,
+    priority: str | None,
+    tags: set[str],
+    body: str,
+    scheduled: OrgDate,
+    deadline: OrgDate,
+    timestamps: list[OrgDate],
+    body_offset: int | None = None,
+    reminders: str | None = None,
+    file_reminders: Reminders | None = None,
+    zone: str | None = None,
+    file_zone: str | None = None,
+    diaries: Iterable[Timestamp] = (),
+) -> NodeTimes:
+    return NodeTimes(
+        heading=heading,
+        priority=priority,
+        tags=tuple(sorted(tags)),
+        body=body,
+        scheduled=None if scheduled.start is None else org_timestamp(scheduled),
+        deadline=None if deadline.start is None else org_timestamp(deadline),
+        timestamps=tuple(map(org_timestamp, timestamps)) + tuple(diaries),
+        body_offset=body_offset,
+        reminders=(
+            None
+            if reminders is None
+            else parse_org_reminders([reminders], f"heading {heading!r}")
+        ),
+        file_reminders=file_reminders,
+        zone=(
+            parse_org_zone([zone], f"heading {heading!r}") if zone is not None else None
+        )
+        or file_zone,
     )
-    deadline_notification_precise_times: list[datetime] = list(
-        map(lambda x: time + x, reminder_intervals["deadline"])
+
+
+def extract_node_times(
+    node: OrgNode,
+    tags: set[str],
+    file_reminders: Reminders | None = None,
+    file_zone: str | None = None,
+) -> NodeTimes:
+    reminders: Any = node.properties.get("REMINDERS")
+    zone: Any = node.properties.get("TIMEZONE")
+    properties: list[str] = [str(x) for x in node.properties.values()]
+    return build_node_times(
+        heading=node.heading,
+        priority=node.priority,
+        tags=tags,
+        body=node.body,
+        scheduled=node.scheduled,
+        deadline=node.deadline,
+        # in the order stream_node_times() finds them: heading and body, then the property drawer
+        timestamps=node.get_timestamps(active=True, range=True, point=True)
+        + flatmap(list(map(active_dates, properties))),
+        reminders=None if reminders is None else str(reminders),
+        file_reminders=file_reminders,
+        zone=None if zone is None else str(zone),
+        file_zone=file_zone,
+        diaries=parse_diaries(
+            "\n".join([node.heading, node.body, *properties]),
+            f"heading {node.heading!r}",
+        ),
     )
-    scheduled_notification_times: list[datetime] = list(
-        map(
-            lambda x: coerce_datetime(x).replace(second=0, microsecond=0),
-            scheduled_notification_precise_times,
-        )
+
+
+def get_timed_nodes(node: OrgRootNode) -> list[NodeTimes]:
+    """Valid nodes that are not done and carry a SCHEDULED, DEADLINE or active timestamp, i.e. the only ones that can ever notify"""
+    load_orgparse()
+    timed_nodes: list[NodeTimes] = []
+    # inherited tags are tracked on a stack of ancestors, OrgNode.tags searches backwards through the whole file for every parent
+    ancestors: list[tuple[int, set[str]]] = [
+        (0, set(node.get_file_property_list("FILETAGS")))
+    ]
+    file_reminders: Reminders | None = parse_org_reminders(
+        node.get_file_property_list("REMINDERS"), node.env.filename or "file"
     )
-    deadline_notification_times: list[datetime] = list(
-        map(
-            lambda x: coerce_datetime(x).replace(second=0, microsecond=0),
-            deadline_notification_precise_times,
-        )
+    file_zone: str | None = parse_org_zone(
+        node.get_file_property_list("TIMEZONE"), node.env.filename or "file"
     )
-    matching_plain_timestamp_nodes: list[tuple[OrgNode, datetime]] = list(
-        map(
-            lambda x: (
-                x,
-                coerce_datetime(
-                    min(
-                        filter(
-                            lambda x: coerce_datetime(x.start).replace(
-                                second=0, microsecond=0
-                            )
-                            in scheduled_notification_times,
-                            x.get_timestamps(active=True, range=True, point=True),
-                        ),
-                        key=lambda x: coerce_datetime(x.start),
-                    ).start
-                ),
-            ),
-            filter(
-                lambda x: any(
-                    coerce_datetime(y.start).replace(second=0, microsecond=0)
-                    in scheduled_notification_times
-                    for y in x.get_timestamps(active=True, range=True, point=True)
-                ),
-                filter(
-                    lambda x: x.get_timestamps(active=True, range=True, point=True),
-                    filter(
-                        lambda x: x._todo not in x.env.done_keys,
-                        valid_nodes,
-                    ),
-                ),
+    for x in node[1:]:
+        while ancestors[-1][0] >= x.level:
+            ancestors.pop()
+        tags: set[str] = set(x.shallow_tags) | ancestors[-1][1]
+        ancestors.append((x.level, tags))
+        if x.heading.strip() == "" or x._todo in x.env.done_keys:
+            continue
+        node_times: NodeTimes = extract_node_times(x, tags, file_reminders, file_zone)
+        if (
+            node_times.scheduled is not None
+            or node_times.deadline is not None
+            or node_times.timestamps
+        ):
+            timed_nodes.append(node_times)
+    return timed_nodes
+
+
+def iter_lines(path: Path) -> Iterator[tuple[int, str]]:
+    """(byte offset, line) for every line of the file, without line endings, one line in memory at a time"""
+    offset: int = 0
+    with open(path, "rb") as f:
+        for raw in f:
+            yield offset, raw.decode("utf8").removesuffix("\n").removesuffix("\r")
+            offset += len(raw)
+
+
+def file_env(path: Path) -> OrgEnv:
+    """The OrgEnv orgparse would build for the file, TODO keywords may be declared anywhere in it"""
+    load_orgparse()
+    env: OrgEnv = OrgEnv(filename=path.name)
+    with open(path, "rb") as f:
+        # only special comments matter, cheap to find without decoding every line
+        for raw in f:
+            if not raw.lstrip().startswith(b"#+"):
+                continue
+            parsed: tuple[str, list[str]] | None = parse_comment(
+                raw.decode("utf8").removesuffix("\n").removesuffix("\r")
+            )
+            if parsed is not None and parsed[0].upper() in (
+                "TODO",
+                "SEQ_TODO",
+                "TYP_TODO",
+            ):
+                for value in parsed[1]:
+                    env.add_todo_keys(*parse_seq_todo(value))
+    return env
+
+
+@dataclass
+class StreamedHeading:
+    """A heading of a streamed file while its lines are read, only what matching needs is kept"""
+
+    offset: int
+    heading: str
+    todo: str | None
+    priority: str | None
+    tags: set[str]
+    # only headings that are not blank and not done can notify, the lines of the others are skipped
+    timed: bool
+    sdc: tuple[OrgDate, OrgDate, OrgDate] | None = None
+    # 0 before the property drawer, 1 inside it, 2 after it
+    properties: int = 0
+    reminders: str | None = None
+    file_reminders: Reminders | None = None
+    zone: str | None = None
+    file_zone: str | None = None
+    timestamps: list[OrgDate] = field(default_factory=list)
+    property_timestamps: list[OrgDate] = field(default_factory=list)
+    # lines of the heading and body, and of the property drawer, that may hold a diary sexp
+    diary_lines: list[str] = field(default_factory=list)
+    property_diary_lines: list[str] = field(default_factory=list)
+
+    def read(self, line: str) -> None:
+        """Feed one line after the heading, the same stages orgparse applies decide whether it is a body line"""
+        if self.sdc is None:
+            self.sdc = parse_sdc(line)
+            if any(self.sdc):
+                return
+        if OrgDateClock.from_str(line):
+            return
+        if self.properties == 1:
+            if line.find(":END:") >= 0:
+                self.properties = 2
+            else:
+                key, value = parse_property(line)
+                if key == "REMINDERS" and value is not None:
+                    self.reminders = str(value)
+                elif key == "TIMEZONE" and value is not None:
+                    self.zone = str(value)
+                if key is not None and "<" in str(value):
+                    self.property_timestamps += active_dates(str(value))
+                    if "<%%(" in str(value):
+                        self.property_diary_lines.append(str(value))
+            return
+        if self.properties == 0 and line.find(":PROPERTIES:") >= 0:
+            self.properties = 1
+            return
+        if OrgNode._repeated_tasks_re.search(line):
+            return
+        self.timestamps += active_dates(line)
+        if "<%%(" in line:
+            self.diary_lines.append(line)
+
+    def node_times(self) -> NodeTimes | None:
+        if not self.timed:
+            return None
+        sdc: tuple[OrgDate, OrgDate, OrgDate] = self.sdc or parse_sdc("")
+        node_times: NodeTimes = build_node_times(
+            heading=self.heading,
+            priority=self.priority,
+            tags=self.tags,
+            body="",
+            scheduled=sdc[0],
+            deadline=sdc[1],
+            timestamps=self.timestamps + self.property_timestamps,
+            body_offset=self.offset,
+            reminders=self.reminders,
+            file_reminders=self.file_reminders,
+            zone=self.zone,
+            file_zone=self.file_zone,
+            diaries=parse_diaries(
+                "\n".join(self.diary_lines + self.property_diary_lines),
+                f"heading {self.heading!r}",
             ),
         )
-    )
-    matching_scheduled_nodes: list[tuple[OrgNode, datetime]] = list(
-        map(
-            lambda x: (x, coerce_datetime(x.scheduled.start)),
-            filter(
-                lambda x: coerce_datetime(x.scheduled.start).replace(
-                    second=0, microsecond=0
+        if (
+            node_times.scheduled is None
+            and node_times.deadline is None
+            and not node_times.timestamps
+        ):
+            return None
+        return node_times
+
+
+def stream_node_times(path: Path) -> Iterator[NodeTimes]:
+    """get_timed_nodes() for a file read line by line, without building the tree.
+    Bodies are not kept, each record carries body_offset instead, see load_body().
+    """
+    load_orgparse()
+    env: OrgEnv = file_env(path)
+    done_keys: set[str] = set(env.done_keys)
+    file_tags: set[str] = set()
+    file_reminders: list[str] = []
+    file_zones: list[str] = []
+    ancestors: list[tuple[int, set[str]]] = []
+    current: StreamedHeading | None = None
+    for offset, line in iter_lines(path):
+        if RE_NODE_HEADER.search(line):
+            node_times: NodeTimes | None = (
+                current.node_times() if current is not None else None
+            )
+            if node_times is not None:
+                yield node_times
+            heading, level = parse_heading_level(line) or (line, None)
+            heading, shallow_tags = parse_heading_tags(heading)
+            heading, todo = parse_heading_todos(heading, env.all_todo_keys)
+            heading, priority = parse_heading_priority(heading)
+            while ancestors and ancestors[-1][0] >= level:
+                ancestors.pop()
+            tags: set[str] = set(shallow_tags) | (
+                ancestors[-1][1] if ancestors else file_tags
+            )
+            ancestors.append((level, tags))
+            plain: str = to_plain_text(heading)
+            if current is None:
+                reminders: Reminders | None = parse_org_reminders(
+                    file_reminders, path.name
                 )
-                in scheduled_notification_times,
-                filter(
-                    lambda x: x.scheduled.start is not None
-                    and x.scheduled._repeater is None,
-                    filter(
-                        lambda x: x._todo not in x.env.done_keys,
-                        valid_nodes,
-                    ),
+                zone: str | None = parse_org_zone(file_zones, path.name)
+            current = StreamedHeading(
+                offset=offset,
+                heading=plain,
+                todo=todo,
+                priority=priority,
+                tags=tags,
+                timed=plain.strip() != "" and todo not in done_keys,
+                file_reminders=reminders,
+                file_zone=zone,
+                timestamps=active_dates(heading),
+                diary_lines=[heading] if "<%%(" in heading else [],
+            )
+        elif current is None:
+            parsed: tuple[str, list[str]] | None = parse_comment(line)
+            if parsed is not None and parsed[0].upper() == "FILETAGS":
+                file_tags |= set(parsed[1])
+            elif parsed is not None and parsed[0].upper() == "REMINDERS":
+                file_reminders += parsed[1]
+            elif parsed is not None and parsed[0].upper() == "TIMEZONE":
+                file_zones += parsed[1]
+        elif current.timed:
+            current.read(line)
+    node_times = current.node_times() if current is not None else None
+    if node_times is not None:
+        yield node_times
+
+
+def load_body(path: Path, offset: int) -> str:
+    """The body of the heading starting at `offset`, as OrgNode.body would give it"""
+    load_orgparse()
+    lines: list[str] = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for raw in f:
+            line: str = raw.decode("utf8").removesuffix("\n").removesuffix("\r")
+            if lines and RE_NODE_HEADER.search(line):
+                break
+            lines.append(line)
+    return op.loadi(lines)[1].body
+
+
+def with_body(path: Path, node: NodeTimes) -> NodeTimes:
+    """The node with its body loaded, for records from stream_node_times()"""
+    if node.body_offset is None:
+        return node
+    return replace(node, body=load_body(path, node.body_offset), body_offset=None)
+
+
+def node_and_time_for_notification(
+    time: datetime, node: OrgRootNode, reminder_intervals: ReminderIntervals
+) -> list[tuple[NodeTimes, datetime]]:
+    """The reason we return a list of tuples here instead of just the node is because the generate notification function needs a time in the notification"""
+    return nodes_and_time_for_notification(
+        time=time,
+        valid_nodes=get_timed_nodes(node),
+        reminder_intervals=reminder_intervals,
+    )
+
+
+SCHEDULE_HORIZON: timedelta = timedelta(hours=48)
+
+# kinds of match, in the order node_and_time_for_notification returns them
+SCHEDULED_REPEATER, SCHEDULED, DEADLINE, DEADLINE_WARNING, PLAIN = range(5)
+# the kinds reminded of at the deadline offsets, the others at the scheduled ones
+DEADLINE_KINDS: frozenset[int] = frozenset({DEADLINE, DEADLINE_WARNING})
+
+
+@dataclass
+class OffsetTable:
+    """The minutes a tick checks for one set of offsets, as wall clock times of one zone, as a set so a lookup
+    doesn't grow with the number of offsets.
+    """
+
+    times: list[datetime]
+    time_set: frozenset[datetime]
+    # the checked minutes' span, [start, end), None without offsets
+    window: tuple[datetime, datetime] | None
+
+    @classmethod
+    def compile(
+        cls, time: datetime, offsets: Iterable[timedelta], zone: Zone
+    ) -> "OffsetTable":
+        """`time` is the tick's minute in naive UTC, offsets are elapsed time from it"""
+        times: list[datetime] = sorted(
+            set(flatmap([zone.walls(floor_minute(time + x)) for x in offsets]))
+        )
+        return cls(
+            times=times,
+            time_set=frozenset(times),
+            window=(times[0], times[-1] + timedelta(minutes=1)) if times else None,
+        )
+
+
+EPOCH: datetime = datetime(1970, 1, 1)
+UTC_EPOCH: datetime = EPOCH.replace(tzinfo=timezone.utc)
+
+
+def nodes_and_time_for_notification(
+    time: datetime,
+    valid_nodes: Iterable[NodeTimes],
+    reminder_intervals: ReminderIntervals,
+) -> list[tuple[NodeTimes, datetime]]:
+    """Single pass over the nodes, routing each match into the bucket of its kind.
+    Only matches are kept, so a generator of nodes is consumed without holding on to the rest.
+    Offsets are compiled into a table once per distinct set and zone, so a node costs O(its timestamps).
+    A naive `time` is wall clock time in the configured zone, event times are returned aware, in the node's zone.
+    """
+    table: ReminderTable = ReminderTable.compile(reminder_intervals)
+    now: datetime = table.instant(time)
+    offset_tables: dict[
+        tuple[tuple[timedelta, ...], tuple[timedelta, ...], Zone],
+        tuple[OffsetTable, OffsetTable],
+    ] = {}
+
+    buckets: list[list[tuple[NodeTimes, datetime]]] = [[] for _ in range(PLAIN + 1)]
+    for x in valid_nodes:
+        zone: Zone = table.zone_for(x)
+        key: tuple[tuple[timedelta, ...], tuple[timedelta, ...], Zone] = (
+            *table.for_node(x),
+            zone,
+        )
+        if key not in offset_tables:
+            offset_tables[key] = (
+                OffsetTable.compile(now, key[0], zone),
+                OffsetTable.compile(now, key[1], zone),
+            )
+        scheduled, deadline = offset_tables[key]
+        # occurrences come in time order, the first match of a kind is its earliest
+        matched: dict[int, datetime] = {}
+        for event, kind, shown in node_occurrences(
+            x, scheduled.window, deadline.window
+        ):
+            if (
+                kind not in matched
+                and event
+                in (deadline if kind in DEADLINE_KINDS else scheduled).time_set
+            ):
+                matched[kind] = shown
+        for kind, shown in matched.items():
+            buckets[kind].append((x, zone.aware(shown)))
+    return flatmap(buckets)
+
+
+@dataclass
+class ScheduleIndex:
+    """Firing minutes of a file's nodes over [start, end), sorted so a tick is a bisect instead of a scan.
+    The window is kept in naive UTC, the entries aware as between() hands them out: fire times in UTC,
+    event times in the node's zone. Naive times passed in are wall clock time in the configured zone.
+    """
+
+    start: datetime
+    end: datetime
+    reminder_intervals: ReminderTable
+    fire_times: list[datetime]
+    # (fire time, node, event time, kind it fires as)
+    entries: list[tuple[datetime, NodeTimes, datetime, int]]
+
+    def covers(self, time: datetime) -> bool:
+        return self.start <= self.reminder_intervals.instant(time) < self.end
+
+    def at(self, time: datetime) -> list[tuple[NodeTimes, datetime]]:
+        return [x[1:3] for x in self.between(time, time + timedelta(minutes=1))]
+
+    def between(
+        self, start: datetime, end: datetime
+    ) -> list[tuple[datetime, NodeTimes, datetime, int]]:
+        """(fire time, node, event time, kind) for every firing minute in [start, end)"""
+        table: ReminderTable = self.reminder_intervals
+        lo: int = bisect.bisect_left(self.fire_times, floor_minute(table.utc(start)))
+        hi: int = bisect.bisect_left(self.fire_times, floor_minute(table.utc(end)))
+        return self.entries[lo:hi]
+
+
+def series_between(
+    series_basis: datetime,
+    interval: timedelta | relativedelta,
+    start: datetime,
+    end: datetime,
+) -> Iterator[datetime]:
+    """Occurrences of the series in [start, end): the basis and every interval after it, a negative interval counting forward too"""
+    series_basis = floor_minute(series_basis)
+    if isinstance(interval, timedelta):
+        interval_minutes: int = abs(int(interval.total_seconds() // 60))
+        if interval_minutes == 0:
+            if start <= series_basis < end:
+                yield series_basis
+            return
+        step: timedelta = timedelta(minutes=interval_minutes)
+        skip: int = max(
+            0, -(-int((start - series_basis).total_seconds() // 60) // interval_minutes)
+        )
+        current: datetime = series_basis + skip * step
+        while current < end:
+            yield current
+            current += step
+    else:
+        months: int = interval_months(interval)
+        if months == 0:
+            if start <= series_basis < end:
+                yield series_basis
+            return
+        n: int = max(0, month_occurrence_index(series_basis, months, start))
+        current = month_occurrence(series_basis, months, n)
+        while current < end:
+            if current >= start:
+                yield current
+            n += 1
+            current = month_occurrence(series_basis, months, n)
+
+
+def delayed(timestamp: Timestamp, start: datetime, end: datetime) -> Iterator[datetime]:
+    """A SCHEDULED timestamp's occurrences in [start, end), each put off by its delay cookie"""
+    delay: timedelta | relativedelta | None = timestamp.warning
+    if delay is None:
+        return timestamp.occurrences(start, end)
+    if isinstance(delay, timedelta):
+        return (x + delay for x in timestamp.occurrences(start - delay, end - delay))
+    # months have no fixed length, look back as far as the delay can reach
+    reach: timedelta = timedelta(days=31 * interval_months(delay) + 1)
+    return (
+        y
+        for y in (x + delay for x in timestamp.occurrences(start - reach, end))
+        if start <= y < end
+    )
+
+
+def deadline_warnings(
+    timestamp: Timestamp, start: datetime, end: datetime
+) -> Iterator[tuple[datetime, datetime]]:
+    """(warning, deadline) in [start, end): a step of the warning from each deadline on, up to the deadline's next occurrence"""
+    previous: datetime | None = timestamp.previous(start)
+    deadlines: Iterable[datetime] = itertools.chain(
+        () if previous is None else (previous,),
+        timestamp.occurrences(start, end),
+        (end,),
+    )
+    for deadline, following in itertools.pairwise(deadlines):
+        for x in series_between(
+            deadline, timestamp.warning, max(start, deadline), min(end, following)
+        ):
+            yield x, deadline
+
+
+def node_occurrences(
+    node: NodeTimes,
+    scheduled: tuple[datetime, datetime] | None,
+    deadline: tuple[datetime, datetime] | None,
+) -> Iterator[tuple[datetime, int, datetime]]:
+    """(event, kind, event time to report) for what occurs in the node within its window, lazily and in time order:
+    SCHEDULED and plain timestamps in `scheduled`, DEADLINEs in `deadline` (wall clock [start, end), None for neither).
+    A SCHEDULED delay puts its occurrences off, a DEADLINE warning is a series of its steps from the deadline,
+    restarting with every occurrence of a repeating deadline.
+    """
+    # most timestamps occur once, they're checked here instead of going through a generator each
+    events: list[tuple[datetime, int, datetime]] = []
+    streams: list[Iterator[tuple[datetime, int, datetime]]] = []
+    if scheduled is not None:
+        for y in node.timestamps:
+            if y.single:
+                if scheduled[0] <= y.start < scheduled[1]:
+                    events.append((y.start, PLAIN, y.start))
+            else:
+                streams.append((x, PLAIN, x) for x in y.occurrences(*scheduled))
+        y = node.scheduled
+        if y is not None and y.single and y.warning is None:
+            if scheduled[0] <= y.start < scheduled[1]:
+                events.append((y.start, SCHEDULED, y.start))
+        elif y is not None:
+            kind: int = SCHEDULED_REPEATER if y.repeats else SCHEDULED
+            streams.append((x, kind, x) for x in delayed(y, *scheduled))
+    y = node.deadline
+    if deadline is not None and y is not None:
+        if y.single and y.warning is None:
+            if deadline[0] <= y.start < deadline[1]:
+                events.append((y.start, DEADLINE, y.start))
+        elif y.warning is None:
+            streams.append((x, DEADLINE, x) for x in y.occurrences(*deadline))
+        else:
+            streams.append(
+                (x, DEADLINE_WARNING, z) for x, z in deadline_warnings(y, *deadline)
+            )
+    if not streams:
+        return iter(sorted(events))
+    return heapq.merge(sorted(events), *streams)
+
+
+@functools.lru_cache(maxsize=64)
+def wall_window(
+    start: datetime, end: datetime, offsets: tuple[timedelta, ...], zone: Zone
+) -> tuple[datetime, datetime] | None:
+    """The wall clock span of events firing in [start, end), None without offsets"""
+    if not offsets:
+        return None
+    # widened for a DST change, the exact check is on the instants
+    return (
+        zone.to_local(start + offsets[0]) - DST_MARGIN,
+        zone.to_local(end + offsets[-1]) + DST_MARGIN,
+    )
+
+
+def schedule_node(
+    node: NodeTimes,
+    start: datetime,
+    end: datetime,
+    reminder_intervals: ReminderIntervals,
+) -> list[tuple[datetime, NodeTimes, datetime, int]]:
+    """(fire time, node, event time, kind) for every minute in [start, end) at which the node is due a reminder,
+    once per kind and minute, with the earliest event time, as in node_and_time_for_notification.
+    The window is naive UTC, offsets count elapsed time back from an event, events and repeaters are
+    the node's wall clock times. Fire times are returned in aware UTC and events in the node's zone.
+    """
+    table: ReminderTable = ReminderTable.compile(reminder_intervals)
+    scheduled_offsets, deadline_offsets = table.for_node(node)
+    zone: Zone = table.zone_for(node)
+
+    # aware times are made by adding to an aware epoch, arithmetic keeps its zone and is much cheaper than replace()
+    zone_epoch: datetime = EPOCH.replace(tzinfo=zone.tz)
+    fired: list[tuple[datetime, NodeTimes, datetime, int]] = []
+    occurrences: int = 0
+    for event, kind, shown in node_occurrences(
+        node,
+        wall_window(start, end, scheduled_offsets, zone),
+        wall_window(start, end, deadline_offsets, zone),
+    ):
+        offsets: tuple[timedelta, ...] = (
+            deadline_offsets if kind in DEADLINE_KINDS else scheduled_offsets
+        )
+        instant: datetime = zone.to_utc(event)
+        if instant.second:
+            # offsets of local mean time, before zones were standardised
+            instant = floor_minute(instant)
+        # a fire time instant - x is in [start, end) for the offsets x in (instant - end, instant - start]
+        low: timedelta = instant - end
+        high: timedelta = instant - start
+        # offsets are sorted whole minutes
+        if low < offsets[-1] and offsets[0] <= high:
+            # fire times inherit UTC from the instant
+            instant = UTC_EPOCH + (instant - EPOCH)
+            shown = zone_epoch + (shown - EPOCH)
+            fired += [
+                (instant - x, node, shown, kind) for x in offsets if low < x <= high
+            ]
+            occurrences += 1
+    if occurrences <= 1:
+        return fired
+    # occurrences can meet at a minute, the earliest event is kept
+    earliest: dict[tuple[datetime, int], tuple[datetime, NodeTimes, datetime, int]] = {}
+    for x in fired:
+        if (x[0], x[3]) not in earliest or x[2] < earliest[x[0], x[3]][2]:
+            earliest[x[0], x[3]] = x
+    return list(earliest.values())
+
+
+def build_schedule(
+    nodes: list[NodeTimes],
+    start: datetime,
+    reminder_intervals: ReminderIntervals,
+    horizon: timedelta = SCHEDULE_HORIZON,
+) -> ScheduleIndex:
+    reminder_intervals = ReminderTable.compile(reminder_intervals)
+    start = reminder_intervals.instant(start)
+    end: datetime = start + horizon
+    entries: list[tuple[datetime, NodeTimes, datetime, int]] = []
+    for node in nodes:
+        entries += schedule_node(node, start, end, reminder_intervals)
+    # stable sorts, a minute's entries go by kind, then in node order
+    entries.sort(key=operator.itemgetter(3))
+    entries.sort(key=operator.itemgetter(0))
+    return ScheduleIndex(
+        start=start,
+        end=end,
+        reminder_intervals=reminder_intervals,
+        fire_times=[x[0] for x in entries],
+        entries=entries,
+    )
+
+
+def nodes_and_times_between(
+    start: datetime,
+    end: datetime,
+    valid_nodes: list[NodeTimes],
+    reminder_intervals: ReminderIntervals,
+) -> list[tuple[datetime, NodeTimes, datetime, int]]:
+    """nodes_and_time_for_notification() for every minute in [start, end): (fire time, node, event time, kind),
+    sorted by fire time"""
+    table: ReminderTable = ReminderTable.compile(reminder_intervals)
+    horizon: timedelta = table.instant(end) - table.instant(start)
+    if horizon <= timedelta(0):
+        return []
+    return build_schedule(
+        nodes=valid_nodes,
+        start=start,
+        reminder_intervals=table,
+        horizon=horizon,
+    ).between(start, end)
+
+
+def collect_notifications(
+    file: Path,
+    time: datetime,
+    cache: ParseCache | None = None,
+    since: datetime | None = None,
+    stream_threshold: int = STREAM_THRESHOLD,
+    reminder_intervals: ReminderIntervals | None = None,
+) -> list[Notification]:
+    """Notifications due at `time`, or for every minute in [since, time] when catching up (needs the cache).
+    Without a cache, files of at least stream_threshold bytes are matched heading by heading as they are read.
+    """
+    intervals: ReminderTable = ReminderTable.compile(reminder_intervals)
+    if cache is None:
+        nodes: list[tuple[NodeTimes, datetime]] = (
+            nodes_and_time_for_notification(
+                time=time,
+                valid_nodes=stream_node_times(file),
+                reminder_intervals=intervals,
+            )
+            if file.stat().st_size >= stream_threshold
+            else node_and_time_for_notification(
+                time=time, node=parse_file(path=file), reminder_intervals=intervals
+            )
+        )
+        return list(
+            map(
+                lambda x: generate_notification(
+                    with_body(file, x[0]),
+                    x[1],
+                    source=str(file),
+                    fire_time=floor_minute(intervals.utc(time)),
                 ),
-            ),
+                nodes,
+            )
         )
+    schedule: ScheduleIndex = cache.schedule(
+        path=file, time=time, reminder_intervals=intervals, since=since
+    )
+    firing: list[tuple[datetime, NodeTimes, datetime, int]] = schedule.between(
+        floor_minute(time if since is None else since),
+        floor_minute(time) + timedelta(minutes=1),
     )
-    matching_deadline_nodes: list[tuple[OrgNode, datetime]] = list(
+    return list(
         map(
-            lambda x: (x, coerce_datetime(x.deadline.start)),
-            filter(
-                lambda x: coerce_datetime(x.deadline.start).replace(
-                    second=0, microsecond=0
-                )
-                in deadline_notification_times,
-                filter(
-                    lambda x: x.deadline.start is not None
-                    and x.deadline._warning is None,
-                    filter(
-                        lambda x: x._todo not in x.env.done_keys,
-                        valid_nodes,
-                    ),
-                ),
+            lambda x: generate_notification(
+                with_body(file, x[1]), x[2], source=str(file), fire_time=x[0]
             ),
+            firing,
         )
     )
-    matching_deadline_only_warning_nodes: list[tuple[OrgNode, datetime]] = list(
-        map(
-            lambda x: (x, coerce_datetime(x.deadline.start)),
-            filter(
-                lambda x: is_in_series(
-                    series_basis=coerce_datetime(x.deadline.start),
-                    interval=-repeater_to_interval(x.deadline._warning),
-                    check_dates=deadline_notification_times,
+
+
+def load_config(
+    org_basedir: str, url: str, overrides: dict[str, Any] | None = None
+) -> Config:
+    """The repo's .org-notifier-config.json, with `overrides` (same keys) on top of it"""
+    config_path: Path = Path(org_basedir) / ".org-notifier-config.json"
+    json_config: dict[str, Any] | None = None
+    if config_path.exists():
+        with open(config_path, "r") as f:
+            json_config = json.load(f)
+    if overrides:
+        json_config = {**(json_config or {}), **overrides}
+    if json_config is not None:
+        config: Config = Config(
+            base_dir=Path(org_basedir),
+            reminder_intervals=json_config.get("reminder_intervals", None),
+            ntfy_url=url,
+            cache_content_hash=json_config.get("cache_content_hash", False),
+            workers=json_config.get("workers", 1),
+            delivery_concurrency=json_config.get("delivery_concurrency", 8),
+            ntfy_timeout=json_config.get("ntfy_timeout", NTFY_TIMEOUT),
+            change_detection=json_config.get("change_detection", "git"),
+            ignore_dirs=Config.ignore_dirs
+            | frozenset(json_config.get("ignore_dirs", [])),
+            ledger=json_config.get("ledger", True),
+            prescan=json_config.get("prescan", True),
+            stream_threshold=json_config.get("stream_threshold", STREAM_THRESHOLD),
+            pipeline=json_config.get("pipeline", "sync"),
+            queue_size=json_config.get("queue_size", 64),
+            coalesce_by=json_config.get("coalesce_by", None),
+            coalesce_threshold=json_config.get("coalesce_threshold", 3),
+            metrics_log=json_config.get("metrics_log", False),
+            metrics_port=json_config.get("metrics_port", None),
+            tag_reminders={
+                tag: parse_reminders(value)
+                for tag, value in json_config.get("tag_reminders", {}).items()
+            },
+            timezone=json_config.get("timezone", None),
+            coordination=json_config.get("coordination", None),
+            coordination_mode=json_config.get("coordination_mode", "leader"),
+            replica=json_config.get("replica", None),
+            coordination_path=json_config.get("coordination_path", None),
+            lease_ttl=parse_duration(json_config.get("lease_ttl", "2m")),
+        )
+        # invalid offsets (compiling them) or an unknown zone raise ValueError here rather than on the first tick
+        get_zone(config.reminders.timezone)
+        if config.coordination not in (None, *COORDINATORS):
+            raise ValueError(f"Unknown coordination {config.coordination!r}")
+        if config.coordination_mode not in ("leader", "shard"):
+            raise ValueError(f"Unknown coordination mode {config.coordination_mode!r}")
+        return config
+    else:
+        return Config(
+            base_dir=Path(org_basedir),
+            reminder_intervals=None,
+            ntfy_url=url,
+        )
+
+
+LEDGER_FILENAME: str = ".org-notifier-ledger.sqlite"
+# how far back a run catches up on ticks that were missed
+MAX_CATCH_UP: timedelta = timedelta(hours=24)
+# delivered notifications are remembered this long
+LEDGER_RETENTION: timedelta = timedelta(days=7)
+
+
+# retry delays double from the base up to the max, with jitter
+OUTBOX_BACKOFF_BASE: timedelta = timedelta(seconds=30)
+OUTBOX_BACKOFF_MAX: timedelta = timedelta(hours=1)
+# a notification is given up on after this many failed deliveries
+OUTBOX_MAX_ATTEMPTS: int = 10
+# a retry claimed by a run is hidden from other runs this long, then retried if the run didn't settle it
+OUTBOX_CLAIM: timedelta = timedelta(minutes=10)
+
+
+def retry_after(response: requests.Response | None, time: datetime) -> timedelta | None:
+    """The server's Retry-After, in seconds or as an HTTP date"""
+    value: str | None = (
+        response.headers.get("Retry-After") if response is not None else None
+    )
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return timedelta(seconds=int(value))
+    from email.utils import parsedate_to_datetime
+
+    try:
+        until: datetime = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return until.astimezone(timezone.utc) - time.astimezone(timezone.utc)
+
+
+def retry_delay(
+    attempts: int,
+    response: requests.Response | None,
+    time: datetime,
+    rng: random.Random | None = None,
+) -> timedelta:
+    """Exponential backoff with equal jitter, but never sooner than the server asked for"""
+    import random
+
+    cap: timedelta = min(OUTBOX_BACKOFF_MAX, OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1))
+    delay: timedelta = cap / 2 + cap / 2 * (rng or random).random()
+    after: timedelta | None = retry_after(response, time)
+    return delay if after is None else max(delay, after)
+
+
+class Ledger:
+    """On-disk record of delivered notifications and of the last completed tick.
+    A notification is claimed before it is sent, so overlapping runs can't both send it.
+    A delivery that fails with a retryable error goes to the outbox and is retried by later ticks,
+    other failures are released.
+    Times are kept as UTC ISO strings, so they compare as text. Naive times passed in (and those of ledgers
+    written before times were aware) are the system's local time, as datetime.astimezone() takes them.
+    """
+
+    def __init__(self, path: Path | str, replica: str | None = None):
+        # sharded replicas each tick for their own files, so each keeps its own last tick
+        self.tick_key: str = "last_tick" if replica is None else f"last_tick.{replica}"
+        # a ledger is used by one thread at a time, but not always the one that opened it (see TenantGroup)
+        self.connection: sqlite3.Connection = sqlite3.connect(
+            path, timeout=30, check_same_thread=False
+        )
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS sent (
+                source TEXT NOT NULL,
+                heading TEXT NOT NULL,
+                event TEXT NOT NULL,
+                fire TEXT NOT NULL,
+                PRIMARY KEY (source, heading, event, fire)
+            );
+            CREATE INDEX IF NOT EXISTS sent_fire ON sent (fire);
+            CREATE TABLE IF NOT EXISTS state (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS outbox (
+                source TEXT NOT NULL,
+                heading TEXT NOT NULL,
+                event TEXT NOT NULL,
+                fire TEXT NOT NULL,
+                notification TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                next_attempt TEXT NOT NULL,
+                PRIMARY KEY (source, heading, event, fire)
+            );
+            """)
+
+    @staticmethod
+    def key(notification: Notification) -> tuple[str, str, str, str]:
+        fire_time: datetime = (
+            notification.time
+            if notification.fire_time is None
+            else notification.fire_time
+        )
+        return (
+            notification.source,
+            notification.title,
+            notification.time.isoformat(),
+            fire_time.isoformat(),
+        )
+
+    def last_tick(self) -> datetime | None:
+        row: tuple[str] | None = self.connection.execute(
+            "SELECT value FROM state WHERE key = ?", (self.tick_key,)
+        ).fetchone()
+        return (
+            None
+            if row is None
+            else datetime.fromisoformat(row[0]).astimezone(timezone.utc)
+        )
+
+    def window_start(self, time: datetime) -> datetime:
+        """First minute the tick at `time` is responsible for: the one after the last completed tick"""
+        now: datetime = floor_minute(time.astimezone(timezone.utc))
+        last_tick: datetime | None = self.last_tick()
+        if last_tick is None or last_tick >= now:
+            return now
+        return max(last_tick + timedelta(minutes=1), now - MAX_CATCH_UP)
+
+    def claim(self, notifications: list[Notification]) -> list[Notification]:
+        """Mark as sent and return the notifications nobody has sent yet"""
+        claimed: list[Notification] = []
+        with self.connection:
+            for notification in notifications:
+                cursor: sqlite3.Cursor = self.connection.execute(
+                    "INSERT OR IGNORE INTO sent VALUES (?, ?, ?, ?)",
+                    self.key(notification),
                 )
-                == True,
-                filter(
-                    lambda x: (x.deadline._warning is not None)
-                    and (x.deadline._repeater is None),
-                    filter(
-                        lambda x: x._todo not in x.env.done_keys,
-                        valid_nodes,
-                    ),
+                if cursor.rowcount == 1:
+                    claimed.append(notification)
+        return claimed
+
+    def release(self, notifications: list[Notification]) -> None:
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM sent WHERE source = ? AND heading = ? AND event = ? AND fire = ?",
+                map(self.key, notifications),
+            )
+
+    @staticmethod
+    def encode(notification: Notification) -> str:
+        return json.dumps(
+            {
+                "title": notification.title,
+                "priority": notification.priority,
+                "tags": notification.tags,
+                "message": notification.message,
+                "time": notification.time.isoformat(),
+                "source": notification.source,
+                "fire_time": (
+                    None
+                    if notification.fire_time is None
+                    else notification.fire_time.isoformat()
                 ),
-            ),
+            }
         )
-    )
-    matching_scheduled_only_repeater_nodes: list[tuple[OrgNode, datetime]] = list(
-        map(
-            lambda x: (
-                x,
-                coerce_datetime(x.scheduled.start).replace(
-                    year=time.year, month=time.month, day=time.day
+
+    @staticmethod
+    def decode(payload: str) -> Notification:
+        fields: dict[str, Any] = json.loads(payload)
+        return Notification(
+            **{
+                **fields,
+                "time": datetime.fromisoformat(fields["time"]),
+                "fire_time": (
+                    None
+                    if fields["fire_time"] is None
+                    else datetime.fromisoformat(fields["fire_time"])
                 ),
+            }
+        )
+
+    def claim_due(
+        self, time: datetime, owns: Callable[[Path], bool] = lambda _: True
+    ) -> list[tuple[Notification, int]]:
+        """Outbox notifications whose next attempt has come and whose file `owns` accepts, with their failed attempts so far.
+        Each is claimed by moving its next attempt on, only if no other run did first, so overlapping runs
+        don't both retry it. settle() then drops or requeues it, a run that dies in between leaves it to be retried.
+        """
+        time = time.astimezone(timezone.utc)
+        rows: list[tuple[str, str, str, str, str, int, str]] = self.connection.execute(
+            "SELECT source, heading, event, fire, notification, attempts, next_attempt FROM outbox"
+            " WHERE next_attempt <= ? ORDER BY next_attempt",
+            (time.isoformat(),),
+        ).fetchall()
+        claimed: list[tuple[Notification, int]] = []
+        with self.connection:
+            for *key, payload, attempts, next_attempt in rows:
+                notification: Notification = self.decode(payload)
+                if not owns(Path(notification.source)):
+                    continue
+                cursor: sqlite3.Cursor = self.connection.execute(
+                    "UPDATE outbox SET next_attempt = ? WHERE source = ? AND heading = ? AND event = ? AND fire = ?"
+                    " AND next_attempt = ?",
+                    ((time + OUTBOX_CLAIM).isoformat(), *key, next_attempt),
+                )
+                if cursor.rowcount == 1:
+                    claimed.append((notification, attempts))
+        return claimed
+
+    def outbox_size(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def settle(
+        self,
+        delivered: list[tuple[Notification, requests.Response | None]],
+        time: datetime,
+        attempts: dict[tuple[str, str, str, str], int],
+        held_back: list[Notification] | None = None,
+        rng: random.Random | None = None,
+    ) -> tuple[list[Notification], list[Notification]]:
+        """Record how deliveries went: delivered ones leave the outbox, retryable failures are (re)queued
+        with backoff, anything else is released. `attempts` holds the earlier failures of outbox retries.
+        What the circuit breaker held back was never tried, it's queued for the next tick without an attempt.
+        Returns the notifications that were not delivered, and those of them queued for a retry.
+        """
+        failed: list[Notification] = []
+        deferred: list[Notification] = []
+        # by identity, digests are the objects that were delivered
+        held: set[int] = {id(x) for x in held_back or []}
+        with self.connection:
+            for digest, response in delivered:
+                members: list[Notification] = expand_digests([digest])
+                if response is not None and response.ok:
+                    self.drop(members)
+                    continue
+                failed += members
+                if id(digest) in held:
+                    self.connection.executemany(
+                        "INSERT OR REPLACE INTO outbox VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        [
+                            (
+                                *self.key(x),
+                                self.encode(x),
+                                attempts.get(self.key(x), 0),
+                                time.astimezone(timezone.utc).isoformat(),
+                            )
+                            for x in members
+                        ],
+                    )
+                    deferred += members
+                    continue
+                if not is_retryable(response):
+                    self.drop(members)
+                    self.release(members)
+                    continue
+                for notification in members:
+                    attempt: int = attempts.get(self.key(notification), 0) + 1
+                    if attempt >= OUTBOX_MAX_ATTEMPTS:
+                        print(
+                            f"Giving up on notification {notification.title!r} after {attempt} attempts"
+                        )
+                        self.drop([notification])
+                        continue
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO outbox VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            *self.key(notification),
+                            self.encode(notification),
+                            attempt,
+                            (time + retry_delay(attempt, response, time, rng))
+                            .astimezone(timezone.utc)
+                            .isoformat(),
+                        ),
+                    )
+                    deferred.append(notification)
+        return failed, deferred
+
+    def drop(self, notifications: list[Notification]) -> None:
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM outbox WHERE source = ? AND heading = ? AND event = ? AND fire = ?",
+                map(self.key, notifications),
+            )
+
+    def breaker(self) -> CircuitBreaker:
+        row: tuple[str] | None = self.connection.execute(
+            "SELECT value FROM state WHERE key = 'breaker'"
+        ).fetchone()
+        if row is None:
+            return CircuitBreaker()
+        state: dict[str, Any] = json.loads(row[0])
+        return CircuitBreaker(
+            failures=state["failures"],
+            open_until=(
+                None
+                if state["open_until"] is None
+                else datetime.fromisoformat(state["open_until"]).astimezone(
+                    timezone.utc
+                )
             ),
-            filter(
-                lambda x: is_in_series(
-                    series_basis=coerce_datetime(x.scheduled.start),
-                    interval=repeater_to_interval(x.scheduled._repeater),
-                    check_dates=scheduled_notification_times,
+        )
+
+    def save_breaker(self, breaker: CircuitBreaker) -> None:
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO state VALUES ('breaker', ?)",
+                (
+                    json.dumps(
+                        {
+                            "failures": breaker.failures,
+                            "open_until": (
+                                None
+                                if breaker.open_until is None
+                                else breaker.open_until.astimezone(
+                                    timezone.utc
+                                ).isoformat()
+                            ),
+                        }
+                    ),
+                ),
+            )
+
+    def finish_tick(self, time: datetime) -> None:
+        time = time.astimezone(timezone.utc)
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO state VALUES (?, ?)",
+                (self.tick_key, floor_minute(time).isoformat()),
+            )
+            self.connection.execute(
+                "DELETE FROM sent WHERE fire < ?",
+                ((time - LEDGER_RETENTION).isoformat(),),
+            )
+            self.connection.execute(
+                "DELETE FROM outbox WHERE fire < ?",
+                ((time - LEDGER_RETENTION).isoformat(),),
+            )
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class FlockCoordinator:
+    """Replicas meeting in a directory of lock files, on one host or a filesystem with working flock().
+    The leader holds leader.lock and every live replica holds replica.<name>.lock. The kernel drops
+    a process's locks when it dies, so a dead leader is replaced by the next tick of another replica.
+    """
+
+    def __init__(self, path: Path, replica: str):
+        path.mkdir(parents=True, exist_ok=True)
+        self.path: Path = path
+        self.replica: str = replica
+        self.leader_fd: int | None = None
+        self.member_fd: int | None = None
+
+    @classmethod
+    def from_config(cls, path: Path, config: Config) -> "FlockCoordinator":
+        # locks go with their process, lease_ttl has nothing to time out
+        return cls(path, config.replica_name)
+
+    @staticmethod
+    def try_lock(path: Path) -> int | None:
+        """A descriptor of `path` holding its lock, None when another process holds it"""
+        import fcntl
+
+        fd: int = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
+
+    def is_leader(self, time: datetime) -> bool:
+        if self.leader_fd is None:
+            self.leader_fd = self.try_lock(self.path / "leader.lock")
+        return self.leader_fd is not None
+
+    @staticmethod
+    def is_held(path: Path) -> bool:
+        import fcntl
+
+        try:
+            fd: int = os.open(path, os.O_RDWR)
+        except FileNotFoundError:
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        finally:
+            os.close(fd)
+        return False
+
+    def members(self, time: datetime) -> list[str]:
+        own: Path = self.path / f"replica.{self.replica}.lock"
+        if self.member_fd is None:
+            from time import sleep
+
+            for _ in range(100):
+                # other replicas checking whether this one is alive hold its lock for a moment
+                self.member_fd = self.try_lock(own)
+                if self.member_fd is not None:
+                    break
+                sleep(0.01)
+            else:
+                print(f"Replica name {self.replica!r} is in use in {self.path}")
+        # files of replicas that are gone stay behind unlocked
+        return sorted(
+            x.name.removeprefix("replica.").removesuffix(".lock")
+            for x in self.path.glob("replica.*.lock")
+            if (x == own and self.member_fd is not None) or self.is_held(x)
+        )
+
+    def close(self) -> None:
+        if self.member_fd is not None:
+            (self.path / f"replica.{self.replica}.lock").unlink(missing_ok=True)
+        for fd in (self.leader_fd, self.member_fd):
+            if fd is not None:
+                os.close(fd)
+        self.leader_fd = self.member_fd = None
+
+
+class SqliteCoordinator:
+    """Replicas meeting in an SQLite database of leases that expire unless renewed within `ttl`, for when
+    a lock can't be trusted to go away with its process. Leases run on tick times, not the clock,
+    so a dead leader is replaced once its lease runs out and the ledger catches up on the ticks in between.
+    """
+
+    def __init__(self, path: Path, replica: str, ttl: timedelta):
+        self.replica: str = replica
+        self.ttl: timedelta = ttl
+        self.connection: sqlite3.Connection = sqlite3.connect(
+            path, timeout=30, check_same_thread=False
+        )
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS lease (
+                name TEXT PRIMARY KEY,
+                holder TEXT NOT NULL,
+                expires TEXT NOT NULL
+            );
+            """)
+
+    @classmethod
+    def from_config(cls, path: Path, config: Config) -> "SqliteCoordinator":
+        return cls(path, config.replica_name, config.lease_ttl)
+
+    def renew(self, name: str, time: datetime) -> str:
+        """Take or renew the lease `name` unless another replica holds it, returns its holder"""
+        time = time.astimezone(timezone.utc)
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO lease VALUES (?, ?, ?) ON CONFLICT (name) DO UPDATE"
+                " SET holder = excluded.holder, expires = excluded.expires"
+                " WHERE holder = excluded.holder OR expires <= ?",
+                (name, self.replica, (time + self.ttl).isoformat(), time.isoformat()),
+            )
+            return self.connection.execute(
+                "SELECT holder FROM lease WHERE name = ?", (name,)
+            ).fetchone()[0]
+
+    def is_leader(self, time: datetime) -> bool:
+        return self.renew("leader", time) == self.replica
+
+    def members(self, time: datetime) -> list[str]:
+        self.renew(f"replica.{self.replica}", time)
+        return [
+            x[0]
+            for x in self.connection.execute(
+                "SELECT holder FROM lease WHERE name LIKE 'replica.%' AND expires > ? ORDER BY holder",
+                (time.astimezone(timezone.utc).isoformat(),),
+            )
+        ]
+
+    def close(self) -> None:
+        # hand over at once instead of when the leases run out
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM lease WHERE holder = ?", (self.replica,)
+            )
+        self.connection.close()
+
+
+# coordination backends by name, with where they meet by default
+COORDINATORS: dict[str, tuple[type, str]] = {
+    "flock": (FlockCoordinator, ".org-notifier-replicas"),
+    "sqlite": (SqliteCoordinator, ".org-notifier-replicas.sqlite"),
+}
+# points per replica on the hash ring, more points spread the files more evenly
+RING_POINTS: int = 64
+
+
+def ring_hash(key: str) -> int:
+    import hashlib
+
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest())
+
+
+class HashRing:
+    """Consistent hashing of keys onto members: a member joining or leaving only moves the keys
+    on its own arcs of the ring, the others keep theirs (and their parse caches)"""
+
+    def __init__(self, members: list[str], points: int = RING_POINTS):
+        ring: list[tuple[int, str]] = sorted(
+            (ring_hash(f"{x}#{i}"), x) for x in members for i in range(points)
+        )
+        self.hashes: list[int] = [x[0] for x in ring]
+        self.members: list[str] = [x[1] for x in ring]
+
+    def owner(self, key: str) -> str | None:
+        if not self.hashes:
+            return None
+        return self.members[
+            bisect.bisect(self.hashes, ring_hash(key)) % len(self.hashes)
+        ]
+
+
+class Replica:
+    """This process's part among the replicas sharing a repo, see Config.coordination"""
+
+    def __init__(self, config: Config):
+        backend, path = COORDINATORS[config.coordination]
+        self.base_dir: Path = config.base_dir
+        self.name: str = config.replica_name
+        self.shard: bool = config.coordination_mode == "shard"
+        self.coordinator: FlockCoordinator | SqliteCoordinator = backend.from_config(
+            config.base_dir / (config.coordination_path or path), config
+        )
+
+    def plan(self, time: datetime) -> Callable[[Path], bool] | None:
+        """Which org files are this replica's in the tick at `time`, None when it sits the tick out"""
+        if not self.shard:
+            return (lambda _: True) if self.coordinator.is_leader(time) else None
+        ring: HashRing = HashRing(self.coordinator.members(time))
+        # relative paths, replicas may have the repo mounted in different places
+        return (
+            lambda path: ring.owner(Path(path).relative_to(self.base_dir).as_posix())
+            == self.name
+        )
+
+    def close(self) -> None:
+        self.coordinator.close()
+
+
+# a full walk is forced this often even when git says nothing changed, to pick up new files git doesn't track
+FULL_RESCAN_INTERVAL: timedelta = timedelta(hours=1)
+
+
+def find_org_files(base_dir: Path, ignore_dirs: frozenset[str]) -> list[Path]:
+    org_files: list[Path] = []
+    for root, dirs, files in os.walk(base_dir):
+        dirs[:] = [x for x in dirs if x not in ignore_dirs]
+        org_files.extend(Path(root) / x for x in files if x.endswith(".org"))
+    return sorted(org_files)
+
+
+def git_head(base_dir: Path) -> str | None:
+    """Commit checked out in base_dir, read straight from .git so the common case needs no subprocess"""
+    git_dir: Path = base_dir / ".git"
+    try:
+        if git_dir.is_file():
+            git_dir = base_dir / git_dir.read_text().removeprefix("gitdir:").strip()
+        head: str = (git_dir / "HEAD").read_text().strip()
+        if not head.startswith("ref:"):
+            return head
+        ref: str = head.removeprefix("ref:").strip()
+        if (git_dir / ref).is_file():
+            return (git_dir / ref).read_text().strip()
+        for line in (git_dir / "packed-refs").read_text().splitlines():
+            if line.endswith(" " + ref):
+                return line.split(" ", 1)[0]
+    except OSError:
+        return None
+    return None
+
+
+def git_changed_files(base_dir: Path, old: str, new: str) -> list[Path] | None:
+    import subprocess
+
+    try:
+        result: subprocess.CompletedProcess = subprocess.run(
+            [
+                "git",
+                "-C",
+                str(base_dir),
+                "diff",
+                "--name-only",
+                "--relative",
+                "-z",
+                old,
+                new,
+            ],
+            capture_output=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return [base_dir / x for x in result.stdout.decode().split("\0") if x]
+
+
+def discover_org_files(config: Config, cache: ParseCache, time: datetime) -> list[Path]:
+    """Org files under the base dir.
+    When the base dir is a git checkout, an unchanged HEAD means no walk at all and a moved HEAD means a git diff.
+    Git only stands in for the walk, the files are still stat'ed every tick so uncommitted edits are seen.
+    """
+    head: str | None = (
+        git_head(config.base_dir) if config.change_detection == "git" else None
+    )
+    state: ScanState | None = cache.scan_state
+    if (
+        head is not None
+        and state is not None
+        and state.git_head is not None
+        and time - state.full_scan_at < FULL_RESCAN_INTERVAL
+    ):
+        if head == state.git_head:
+            return state.files
+        changed: list[Path] | None = git_changed_files(
+            config.base_dir, state.git_head, head
+        )
+        if changed is not None:
+            changed_org: set[Path] = {
+                x
+                for x in changed
+                if x.name.endswith(".org")
+                and not config.ignore_dirs.intersection(
+                    x.relative_to(config.base_dir).parts
                 )
-                == True,
-                filter(
-                    lambda x: x.scheduled._repeater is not None,
-                    filter(lambda x: x._todo not in x.env.done_keys, valid_nodes),
+            }
+            files: list[Path] = sorted(
+                (set(state.files) - changed_org)
+                | {x for x in changed_org if x.is_file()}
+            )
+            cache.scan_state = ScanState(
+                git_head=head, files=files, full_scan_at=state.full_scan_at
+            )
+            cache.dirty = True
+            return files
+    files = find_org_files(config.base_dir, config.ignore_dirs)
+    cache.scan_state = ScanState(git_head=head, files=files, full_scan_at=time)
+    # without git every tick walks, the scan time only needs saving for the hourly rescan of a git checkout
+    if state is None or state.files != files or state.git_head != head or head:
+        cache.dirty = True
+    return files
+
+
+# how many of the slowest files a tick reports
+SLOWEST_FILES: int = 5
+
+
+@dataclass
+class TickStats:
+    """What one tick did and where its time went, filled in by run_tick()"""
+
+    time: datetime
+    # wall-clock seconds per phase, in the order the phases ran
+    phases: dict[str, float] = field(default_factory=dict)
+    files_scanned: int = 0
+    files_parsed: int = 0
+    files_skipped: int = 0
+    nodes: int = 0
+    notifications_collected: int = 0
+    notifications_sent: int = 0
+    notifications_failed: int = 0
+    # failed deliveries queued in the outbox, and outbox notifications retried this tick
+    notifications_deferred: int = 0
+    notifications_retried: int = 0
+    # seconds spent collecting each file, including any parse that happened then
+    file_times: dict[str, float] = field(default_factory=dict)
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started: float = perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + perf_counter() - started
+
+    def count_files(
+        self, org_files: list[Path], cache: "ParseCache | None", parsed_before: int
+    ) -> None:
+        """Fill in the file and node counts once the tick's files went through the cache"""
+        if cache is None:
+            self.files_parsed = len(org_files)
+            return
+        self.files_parsed = cache.parsed - parsed_before
+        entries: list[CachedFile] = [
+            cache.entries[x] for x in org_files if x in cache.entries
+        ]
+        self.files_skipped = len([x for x in entries if x.skipped_until is not None])
+        self.nodes = sum(map(lambda x: len(x.nodes), entries))
+
+    def slowest_files(self, n: int = SLOWEST_FILES) -> list[tuple[str, float]]:
+        return sorted(self.file_times.items(), key=lambda x: x[1], reverse=True)[:n]
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "time": self.time.isoformat(),
+            "duration": sum(self.phases.values()),
+            "phases": self.phases,
+            "files_scanned": self.files_scanned,
+            "files_parsed": self.files_parsed,
+            "files_skipped": self.files_skipped,
+            "nodes": self.nodes,
+            "notifications_collected": self.notifications_collected,
+            "notifications_sent": self.notifications_sent,
+            "notifications_failed": self.notifications_failed,
+            "notifications_deferred": self.notifications_deferred,
+            "notifications_retried": self.notifications_retried,
+            "slowest_files": self.slowest_files(),
+        }
+
+    def to_prometheus(self) -> str:
+        """The stats in the Prometheus text exposition format"""
+        lines: list[str] = [
+            "# TYPE org_notifier_tick_timestamp_seconds gauge",
+            f"org_notifier_tick_timestamp_seconds {self.time.timestamp()}",
+            "# TYPE org_notifier_tick_phase_seconds gauge",
+            *[
+                f'org_notifier_tick_phase_seconds{{phase="{name}"}} {seconds}'
+                for name, seconds in self.phases.items()
+            ],
+        ]
+        for name in (
+            "files_scanned",
+            "files_parsed",
+            "files_skipped",
+            "nodes",
+            "notifications_collected",
+            "notifications_sent",
+            "notifications_failed",
+            "notifications_deferred",
+            "notifications_retried",
+        ):
+            lines += [
+                f"# TYPE org_notifier_tick_{name} gauge",
+                f"org_notifier_tick_{name} {getattr(self, name)}",
+            ]
+        lines.append("# TYPE org_notifier_tick_file_seconds gauge")
+        lines += [
+            f"org_notifier_tick_file_seconds{{file={json.dumps(path)}}} {seconds}"
+            for path, seconds in self.slowest_files()
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def log_tick_stats(stats: TickStats) -> None:
+    print(json.dumps(stats.to_json()), file=sys.stderr, flush=True)
+
+
+class MetricsServer:
+    """Serves the latest TickStats at /metrics from a background thread"""
+
+    def __init__(self, port: int, host: str = ""):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.stats: TickStats | None = None
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body: bytes = (
+                    server.stats.to_prometheus() if server.stats is not None else ""
+                ).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.port: int = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@contextlib.contextmanager
+def maybe_profile(path: str | None) -> Iterator[None]:
+    """Profile the enclosed block with cProfile and dump the stats to `path`, a no-op without a path"""
+    if path is None:
+        yield
+        return
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+
+@contextlib.contextmanager
+def gc_paused() -> Iterator[None]:
+    """Hold off the cyclic garbage collector while the enclosed block builds many acyclic records,
+    each burst of allocations would otherwise set off collections going over everything built so far
+    """
+    import gc
+
+    enabled: bool = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def run_tick(
+    config: Config,
+    time: datetime,
+    session: requests.Session,
+    cache: ParseCache | None = None,
+    ledger: Ledger | None = None,
+    stats: TickStats | None = None,
+    replica: Replica | None = None,
+) -> list[requests.Response]:
+    # ticks run on aware UTC time, a naive `time` is wall clock time in the configured zone
+    time = config.reminders.utc(time)
+    if config.pipeline == "async":
+        import asyncio
+
+        return asyncio.run(
+            run_tick_async(
+                config=config,
+                time=time,
+                session=session,
+                cache=cache,
+                ledger=ledger,
+                stats=stats,
+                replica=replica,
+            )
+        )
+    owns: Callable[[Path], bool] | None = (
+        replica.plan(time) if replica is not None else lambda _: True
+    )
+    if owns is None:
+        return []
+    stats = stats if stats is not None else TickStats(time=time)
+    parsed: int = cache.parsed if cache is not None else 0
+    with stats.phase("discover"):
+        if cache is None:
+            org_files: list[Path] = find_org_files(config.base_dir, config.ignore_dirs)
+        else:
+            org_files = discover_org_files(config=config, cache=cache, time=time)
+            cache.prune(org_files)
+        org_files = list(filter(owns, org_files))
+    stats.files_scanned = len(org_files)
+    if cache is not None:
+        with stats.phase("parse"):
+            cache.refresh(
+                paths=org_files,
+                time=time,
+                reminder_intervals=config.reminders,
+                workers=config.workers,
+            )
+    since: datetime | None = (
+        ledger.window_start(time) if ledger is not None and cache is not None else None
+    )
+
+    def timed_collect(file: Path) -> list[Notification]:
+        started: float = perf_counter()
+        try:
+            return collect_notifications(
+                file=file,
+                time=time,
+                cache=cache,
+                since=since,
+                stream_threshold=config.stream_threshold,
+                reminder_intervals=config.reminders,
+            )
+        finally:
+            stats.file_times[str(file)] = perf_counter() - started
+
+    with stats.phase("match"):
+        notifications: list[Notification] = flatmap(list(map(timed_collect, org_files)))
+    stats.count_files(org_files, cache, parsed)
+    stats.notifications_collected = len(notifications)
+    if ledger is not None:
+        with stats.phase("claim"):
+            notifications = ledger.claim(notifications)
+    retries: list[tuple[Notification, int]] = (
+        ledger.claim_due(time, owns) if ledger is not None else []
+    )
+    stats.notifications_retried = len(retries)
+    breaker: CircuitBreaker = (
+        ledger.breaker() if ledger is not None else CircuitBreaker()
+    )
+    with stats.phase("deliver"):
+        delivered: list[tuple[Notification, requests.Response | None]] = (
+            deliver_notifications(
+                coalesce_notifications(
+                    [x[0] for x in retries] + notifications,
+                    time=time,
+                    by=config.coalesce_by,
+                    threshold=config.coalesce_threshold,
                 ),
-            ),
+                url=config.ntfy_url,
+                time=time,
+                session=session,
+                concurrency=config.delivery_concurrency,
+                timeout=config.ntfy_timeout,
+                breaker=breaker,
+            )
+        )
+    settle_tick(delivered, time, ledger, retries, breaker, stats)
+    if config.metrics_log:
+        log_tick_stats(stats)
+    return [x[1] for x in delivered if x[1] is not None]
+
+
+def settle_tick(
+    delivered: list[tuple[Notification, requests.Response | None]],
+    time: datetime,
+    ledger: Ledger | None,
+    retries: list[tuple[Notification, int]],
+    breaker: CircuitBreaker,
+    stats: TickStats,
+) -> None:
+    """Queue retryable failures in the outbox, persist the breaker and close the tick in the ledger"""
+    if ledger is None:
+        failed: list[Notification] = expand_digests(
+            [x[0] for x in delivered if x[1] is None or not x[1].ok]
         )
+        deferred: list[Notification] = []
+    else:
+        with stats.phase("ledger"):
+            failed, deferred = ledger.settle(
+                delivered,
+                time,
+                {Ledger.key(x[0]): x[1] for x in retries},
+                breaker.held_back,
+            )
+            ledger.save_breaker(breaker)
+            ledger.finish_tick(time)
+    stats.notifications_sent = len(expand_digests([x[0] for x in delivered])) - len(
+        failed
     )
-    all_matching_nodes: list[tuple[OrgNode, datetime]] = (
-        matching_scheduled_only_repeater_nodes
-        + matching_scheduled_nodes
-        + matching_deadline_nodes
-        + matching_deadline_only_warning_nodes
-        + matching_plain_timestamp_nodes
+    stats.notifications_failed = len(failed)
+    stats.notifications_deferred = len(deferred)
+
+
+async def run_tick_async(
+    config: Config,
+    time: datetime,
+    session: requests.Session,
+    cache: ParseCache | None = None,
+    ledger: Ledger | None = None,
+    stats: TickStats | None = None,
+    replica: Replica | None = None,
+) -> list[requests.Response]:
+    """run_tick() as stages joined by bounded queues: discovery, parse and match, delivery.
+    A file's notifications go out while later files are still being parsed, and a full delivery
+    queue holds back parsing instead of piling up notifications.
+    Parsing runs on a process pool when workers > 1, matching and every change to the cache on one thread
+    (the cache is not thread safe),
+    the ledger is only touched from the event loop's thread (sqlite connections are tied to their thread).
+    """
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    time = config.reminders.utc(time)
+    owns: Callable[[Path], bool] | None = (
+        replica.plan(time) if replica is not None else lambda _: True
     )
-    return all_matching_nodes
+    if owns is None:
+        return []
+    stats = stats if stats is not None else TickStats(time=time)
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    intervals: ReminderTable = config.reminders
+    parsed: int = cache.parsed if cache is not None else 0
+    started: float = perf_counter()
+    with stats.phase("discover"):
+        if cache is None:
+            org_files: list[Path] = list(
+                filter(
+                    owns,
+                    await loop.run_in_executor(
+                        None, find_org_files, config.base_dir, config.ignore_dirs
+                    ),
+                )
+            )
+        else:
+            org_files = discover_org_files(config=config, cache=cache, time=time)
+            cache.prune(org_files)
+            org_files = list(filter(owns, org_files))
+            # only stats, parsing is left to the pipeline
+            cache.refresh(
+                paths=org_files,
+                time=time,
+                reminder_intervals=intervals,
+                workers=1,
+            )
+    stats.files_scanned = len(org_files)
+    since: datetime | None = (
+        ledger.window_start(time) if ledger is not None and cache is not None else None
+    )
+    files: asyncio.Queue[Path | None] = asyncio.Queue(maxsize=config.queue_size)
+    outbox: asyncio.Queue[tuple[int, Notification] | None] = asyncio.Queue(
+        maxsize=config.queue_size
+    )
+    retries: list[tuple[Notification, int]] = (
+        ledger.claim_due(time, owns) if ledger is not None else []
+    )
+    stats.notifications_retried = len(retries)
+    breaker: CircuitBreaker = (
+        ledger.breaker() if ledger is not None else CircuitBreaker()
+    )
+    parsers: int = max(1, config.workers)
+    senders: int = max(1, config.delivery_concurrency)
+    # settled before the pipeline starts, later only the match thread touches the cache
+    stale: set[Path] = (
+        {x for x in org_files if x not in cache.fresh} if cache is not None else set()
+    )
+    collected: list[int] = [0]
+    held: list[Notification] = []
+    delivered: list[tuple[int, Notification, requests.Response | None]] = []
 
+    def timed_collect(file: Path) -> list[Notification]:
+        file_started: float = perf_counter()
+        try:
+            return collect_notifications(
+                file=file,
+                time=time,
+                cache=cache,
+                since=since,
+                stream_threshold=config.stream_threshold,
+                reminder_intervals=config.reminders,
+            )
+        finally:
+            stats.file_times[str(file)] = perf_counter() - file_started
 
-def parse_and_send(file: Path, time: datetime, url: str) -> list[requests.Response]:
-    org_tree_root: OrgRootNode = parse_file(path=file)
+    async def produce() -> None:
+        for path in org_files:
+            await files.put(path)
+        for _ in range(parsers):
+            await files.put(None)
 
-    intervals: dict[str, list[timedelta]] = {
-        "scheduled": generate_scheduled_notification_intervals(),
-        "deadline": generate_deadline_notification_intervals(),
-    }
-    nodes: list[tuple[OrgNode, datetime]] = node_and_time_for_notification(
-        time=time, node=org_tree_root, reminder_intervals=intervals
+    async def parse_and_match(
+        parse_pool: ProcessPoolExecutor | None, match_pool: ThreadPoolExecutor
+    ) -> None:
+        while (path := await files.get()) is not None:
+            if parse_pool is not None and cache is not None and path in stale:
+                entry: CachedFile = await loop.run_in_executor(
+                    parse_pool,
+                    parse_cached_file,
+                    path,
+                    cache.use_hash,
+                    time,
+                    intervals,
+                    cache.prescan,
+                    cache.stream_threshold,
+                )
+                await loop.run_in_executor(match_pool, cache.store, path, entry)
+            notifications: list[Notification] = await loop.run_in_executor(
+                match_pool, timed_collect, path
+            )
+            stats.notifications_collected += len(notifications)
+            if ledger is not None:
+                notifications = ledger.claim(notifications)
+            if config.coalesce_by not in (None, "file"):
+                # groups can span files, wait for all of them
+                held.extend(notifications)
+                continue
+            await enqueue(notifications)
+
+    async def enqueue(notifications: list[Notification]) -> None:
+        for notification in coalesce_notifications(
+            notifications,
+            time=time,
+            by=config.coalesce_by,
+            threshold=config.coalesce_threshold,
+        ):
+            await outbox.put((collected[0], notification))
+            collected[0] += 1
+
+    async def deliver(delivery_pool: ThreadPoolExecutor) -> None:
+        while (item := await outbox.get()) is not None:
+            delivered.append(
+                (
+                    item[0],
+                    *await loop.run_in_executor(
+                        delivery_pool,
+                        deliver_notification,
+                        item[1],
+                        config.ntfy_url,
+                        time,
+                        session,
+                        config.ntfy_timeout,
+                        breaker,
+                    ),
+                )
+            )
+
+    with contextlib.ExitStack() as pools:
+        parse_pool: ProcessPoolExecutor | None = (
+            pools.enter_context(process_pool(config.workers))
+            if config.workers > 1 and cache is not None
+            else None
+        )
+        match_pool: ThreadPoolExecutor = pools.enter_context(
+            ThreadPoolExecutor(max_workers=1)
+        )
+        delivery_pool: ThreadPoolExecutor = pools.enter_context(
+            ThreadPoolExecutor(max_workers=senders)
+        )
+        senders_done: asyncio.Future = asyncio.gather(
+            *[deliver(delivery_pool) for _ in range(senders)]
+        )
+        await enqueue([x[0] for x in retries])
+        await asyncio.gather(
+            produce(),
+            *[parse_and_match(parse_pool, match_pool) for _ in range(parsers)],
+        )
+        await enqueue(held)
+        for _ in range(senders):
+            await outbox.put(None)
+        await senders_done
+    stats.phases["pipeline"] = perf_counter() - started - stats.phases["discover"]
+    stats.count_files(org_files, cache, parsed)
+    delivered.sort(key=lambda x: x[0])
+    settle_tick(
+        [(x[1], x[2]) for x in delivered], time, ledger, retries, breaker, stats
+    )
+    if config.metrics_log:
+        log_tick_stats(stats)
+    return [x[2] for x in delivered if x[2] is not None]
+
+
+AGENDA_KINDS: dict[int, str] = {
+    SCHEDULED_REPEATER: "SCHEDULED",
+    SCHEDULED: "SCHEDULED",
+    DEADLINE: "DEADLINE",
+    DEADLINE_WARNING: "DEADLINE",
+    PLAIN: "TIMESTAMP",
+}
+
+
+@dataclass(slots=True)
+class AgendaEntry:
+    # in UTC
+    fire_time: datetime
+    # in the node's zone
+    event: datetime
+    source: Path
+    node: NodeTimes
+    # as schedule_node() matched it
+    match: int
+
+    @property
+    def kind(self) -> str:
+        return AGENDA_KINDS[self.match]
+
+
+def agenda(
+    config: Config,
+    start: datetime,
+    end: datetime,
+    cache: ParseCache | None = None,
+) -> list[AgendaEntry]:
+    """Every reminder due to fire in [start, end), sorted by fire time, from the parse cache and schedule indexes ticks use.
+    A file's cached index answers for the part of the window it covers, only the rest of the window is indexed here.
+    """
+    cache = (
+        cache if cache is not None else ParseCache(use_hash=config.cache_content_hash)
+    )
+    reminders: ReminderTable = config.reminders
+    start, end = floor_minute(reminders.utc(start)), floor_minute(reminders.utc(end))
+    # discovery runs on the real clock, the scan state it leaves in the cache is used by the ticks
+    org_files: list[Path] = discover_org_files(
+        config=config, cache=cache, time=datetime.now(timezone.utc)
     )
-    notifications: list[Notification] = list(
-        map(lambda x: generate_notification(x[0], x[1]), nodes)
+    cache.prune(org_files)
+    cache.refresh(
+        paths=org_files,
+        time=start,
+        reminder_intervals=reminders,
+        workers=config.workers,
     )
-    return list(map(lambda x: send_notification(x, url, time), notifications))
+    entries: list[AgendaEntry] = []
+    # hundreds of thousands of entries for a long window, none of them in a cycle
+    with gc_paused():
+        for path in org_files:
+            entry: CachedFile = cache.get(path)
+            schedule: ScheduleIndex | None = entry.schedules.get(reminders)
+            if schedule is None:
+                firing: list[tuple[datetime, NodeTimes, datetime, int]] = (
+                    nodes_and_times_between(start, end, entry.nodes, reminders)
+                )
+            else:
+                # indexed on either side of the cached index, in order so the parts join up sorted
+                covered: tuple[datetime, datetime] = (
+                    min(max(start, schedule.start.replace(tzinfo=timezone.utc)), end),
+                    max(min(end, schedule.end.replace(tzinfo=timezone.utc)), start),
+                )
+                firing = (
+                    nodes_and_times_between(start, covered[0], entry.nodes, reminders)
+                    + schedule.between(*covered)
+                    + nodes_and_times_between(covered[1], end, entry.nodes, reminders)
+                )
+            entries += [AgendaEntry(x[0], x[2], path, x[1], x[3]) for x in firing]
+        # stable, so a minute's entries keep the file and kind order the ticks send them in
+        return sorted(entries, key=operator.attrgetter("fire_time"))
 
 
-def load_config(org_basedir: str, url: str) -> Config:
-    config_path: Path = Path(org_basedir) / ".org-notifier-config.json"
-    if config_path.exists():
-        with open(config_path, "r") as f:
-            json_config: dict[str, Any] | None = json.load(f)
-        return Config(
-            base_dir=Path(org_basedir),
-            reminder_intervals=json_config.get("reminder_intervals", []),
-            ntfy_url=url,
+def format_agenda(
+    entries: list[AgendaEntry], base_dir: Path, zone: tzinfo | None = None
+) -> str:
+    """One line per entry, fire times in `zone` (the system's by default)"""
+    return "\n".join(
+        f"{x.fire_time.astimezone(zone):%Y-%m-%d %a %H:%M}  {x.kind:<9}  {x.event:%Y-%m-%d %H:%M}"
+        f"  {x.node.heading}  ({x.source.relative_to(base_dir)})"
+        for x in entries
+    )
+
+
+def parse_agenda_time(value: str, start: datetime | None = None) -> datetime:
+    """An ISO date/time, "now", or with a start given, an offset from it like 2h or 7d"""
+    if value == "now":
+        return datetime.now(timezone.utc)
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        if start is None:
+            raise
+        return start + parse_duration(value)
+
+
+def show_agenda(url: str, org_basedir: str, start: str, end: str) -> None:
+    config: Config = load_config(org_basedir=org_basedir, url=url)
+    cache_path: Path = config.cache_path
+    cache: ParseCache = ParseCache.load(
+        cache_path,
+        use_hash=config.cache_content_hash,
+        stream_threshold=config.stream_threshold,
+    )
+    first: datetime = parse_agenda_time(start)
+    print(
+        format_agenda(
+            agenda(config, first, parse_agenda_time(end, first), cache=cache),
+            config.base_dir,
+            config.reminders.zone.tz,
         )
-    else:
-        return Config(
-            base_dir=Path(org_basedir),
-            reminder_intervals=generate_scheduled_notification_intervals(),
-            ntfy_url=url,
+    )
+    if cache.dirty:
+        cache.save(cache_path)
+
+
+class RecordingSession:
+    """Stands in for the HTTP session in a replay: every post is recorded and answered with a 200"""
+
+    def __init__(self):
+        # (title, priority, tags, message) of each post
+        self.posts: list[tuple[str, str, str, str]] = []
+        self.lock: threading.Lock = threading.Lock()
+
+    def post(
+        self,
+        url: str,
+        data: str = "",
+        headers: dict[str, str] | None = None,
+        timeout: float | None = None,
+    ) -> requests.Response:
+        import requests
+
+        headers = headers or {}
+        with self.lock:
+            self.posts.append(
+                (
+                    headers.get("Title", ""),
+                    headers.get("Priority", ""),
+                    headers.get("Tags", ""),
+                    data,
+                )
+            )
+        response: requests.Response = requests.Response()
+        response.status_code = 200
+        response._content = b"recorded"
+        return response
+
+    def take(self) -> list[tuple[str, str, str, str]]:
+        """The posts since the last take, in a stable order (deliveries run concurrently)"""
+        with self.lock:
+            posts, self.posts = self.posts, []
+        return sorted(posts)
+
+    def close(self) -> None:
+        pass
+
+
+@dataclass
+class ReplayReport:
+    ticks: int
+    # wall-clock seconds the ticks took
+    seconds: float
+    # (tick time, title, priority, tags, message) of every notification sent, in tick order
+    notifications: list[tuple[datetime, str, str, str, str]]
+    # wall-clock seconds per phase, summed over the ticks
+    phases: dict[str, float]
+
+    @property
+    def ticks_per_second(self) -> float:
+        return self.ticks / self.seconds if self.seconds else 0.0
+
+
+def replay(
+    config: Config,
+    start: datetime,
+    end: datetime,
+    step: timedelta = timedelta(minutes=1),
+) -> ReplayReport:
+    """Run the ticks from `start` to `end` (exclusive) every `step` on a simulated clock, the whole pipeline
+    with a fresh parse cache and an in-memory ledger, posting into a RecordingSession.
+    The repo's own cache and ledger are left alone, so a replay is the same every time it runs.
+    """
+    reminders: ReminderTable = config.reminders
+    time: datetime = floor_minute(reminders.utc(start))
+    end = reminders.utc(end)
+    cache: ParseCache = ParseCache(
+        use_hash=config.cache_content_hash,
+        prescan=config.prescan,
+        stream_threshold=config.stream_threshold,
+    )
+    ledger: Ledger | None = Ledger(":memory:") if config.ledger else None
+    session: RecordingSession = RecordingSession()
+    report: ReplayReport = ReplayReport(
+        ticks=0, seconds=0.0, notifications=[], phases={}
+    )
+    started: float = perf_counter()
+    try:
+        while time < end:
+            stats: TickStats = TickStats(time=time)
+            run_tick(config, time, session, cache, ledger, stats)
+            for name, seconds in stats.phases.items():
+                report.phases[name] = report.phases.get(name, 0.0) + seconds
+            report.notifications += [(time, *x) for x in session.take()]
+            report.ticks += 1
+            time += step
+    finally:
+        if ledger is not None:
+            ledger.close()
+    report.seconds = perf_counter() - started
+    return report
+
+
+def show_replay(
+    url: str, org_basedir: str, start: str, end: str, step: str = "1m"
+) -> None:
+    config: Config = load_config(org_basedir=org_basedir, url=url)
+    first: datetime = parse_agenda_time(start)
+    report: ReplayReport = replay(
+        config, first, parse_agenda_time(end, first), parse_duration(step)
+    )
+    zone: tzinfo = config.reminders.zone.tz
+    for time, title, priority, tags, _ in report.notifications:
+        print(
+            f"{time.astimezone(zone):%Y-%m-%d %a %H:%M}  {title}  [{priority}] {tags}".rstrip()
         )
+    print(
+        f"{report.ticks} ticks in {report.seconds:.2f}s ({report.ticks_per_second:.1f} ticks/s),"
+        f" {len(report.notifications)} notifications, "
+        + ", ".join(f"{k} {v:.2f}s" for k, v in report.phases.items())
+    )
 
 
-def main(url: str, org_basedir: str):
+def open_ledger(config: Config) -> Ledger | None:
+    if not config.ledger:
+        return None
+    shard: bool = (
+        config.coordination is not None and config.coordination_mode == "shard"
+    )
+    return Ledger(
+        config.base_dir / LEDGER_FILENAME,
+        replica=config.replica_name if shard else None,
+    )
+
+
+def main(url: str, org_basedir: str, profile: str | None = None):
     # load config
     config: Config = load_config(org_basedir=org_basedir, url=url)
     if config:
-        org_files: list[Path] = list(
-            filter(
-                lambda x: x.is_file() and x.name.endswith(".org"),
-                config.base_dir.glob("**/*"),
-            )
-        )
-        now: datetime = datetime.now()
-        responses: list[list[requests.Response]] = flatmap(
-            list(
-                map(
-                    lambda x: parse_and_send(file=x, time=now, url=config.ntfy_url),
-                    org_files,
-                )
-            )
+        cache_path: Path = config.cache_path
+        cache: ParseCache = ParseCache.load(
+            cache_path,
+            use_hash=config.cache_content_hash,
+            prescan=config.prescan,
+            stream_threshold=config.stream_threshold,
         )
+        ledger: Ledger | None = open_ledger(config)
+        replica: Replica | None = Replica(config) if config.coordination else None
+        now: datetime = datetime.now(timezone.utc)
+        try:
+            with LazySession(config.delivery_concurrency) as session:
+                with maybe_profile(profile):
+                    responses: list[requests.Response] = run_tick(
+                        config=config,
+                        time=now,
+                        session=session,
+                        cache=cache,
+                        ledger=ledger,
+                        replica=replica,
+                    )
+        finally:
+            if ledger is not None:
+                ledger.close()
+            if replica is not None:
+                replica.close()
+        if cache.dirty:
+            cache.save(cache_path)
         print([x.text for x in responses])
 
 
+def floor_minute(time: datetime) -> datetime:
+    return time.replace(second=0, microsecond=0)
+
+
+def seconds_until(time: datetime, now: datetime) -> float:
+    return max((time - now).total_seconds(), 0.0)
+
+
+def wait_for_config(url: str, org_basedir: str, stop: threading.Event) -> Config | None:
+    """The config once it's usable, loaded again on every minute boundary until then (None: stopped first).
+    At boot the repo may not be cloned yet, a daemon exiting instead would be restarted by systemd until it gives up.
+    """
+    reported: str | None = None
+    while True:
+        problem: str
+        try:
+            config: Config = load_config(org_basedir=org_basedir, url=url)
+        except ValueError as e:
+            problem = f"Invalid config in {org_basedir}: {e}"
+        else:
+            if config:
+                return config
+            problem = f"Waiting for {org_basedir} to exist and a ntfy url to be set"
+        if problem != reported:
+            print(problem, flush=True)
+            reported = problem
+        now: datetime = datetime.now(timezone.utc)
+        if stop.wait(seconds_until(floor_minute(now) + timedelta(minutes=1), now)):
+            return None
+
+
+def run_daemon(
+    url: str,
+    org_basedir: str,
+    stop: threading.Event | None = None,
+    profile: str | None = None,
+):
+    """Resident alternative to main(): ticks on every minute boundary until SIGTERM/SIGINT or `stop` is set.
+    Config, the parse cache, the ledger and the HTTP session are kept between ticks.
+    With `profile`, only the first tick is profiled."""
+    stop = stop if stop is not None else threading.Event()
+    previous_handlers = {
+        signum: signal.signal(signum, lambda *_: stop.set())
+        for signum in (signal.SIGTERM, signal.SIGINT)
+    }
+    ledger: Ledger | None = None
+    replica: Replica | None = None
+    metrics: MetricsServer | None = None
+    try:
+        config: Config | None = wait_for_config(url, org_basedir, stop)
+        if config is None:
+            return
+        cache_path: Path = config.cache_path
+        cache: ParseCache = ParseCache.load(
+            cache_path,
+            use_hash=config.cache_content_hash,
+            prescan=config.prescan,
+            stream_threshold=config.stream_threshold,
+        )
+        ledger = open_ledger(config)
+        if config.coordination:
+            replica = Replica(config)
+        if config.metrics_port is not None:
+            metrics = MetricsServer(config.metrics_port)
+        with create_session(config.delivery_concurrency) as session:
+            next_tick: datetime = floor_minute(datetime.now(timezone.utc)) + timedelta(
+                minutes=1
+            )
+            while not stop.wait(seconds_until(next_tick, datetime.now(timezone.utc))):
+                stats: TickStats = TickStats(time=next_tick)
+                try:
+                    with maybe_profile(profile):
+                        responses: list[requests.Response] = run_tick(
+                            config=config,
+                            time=next_tick,
+                            session=session,
+                            cache=cache,
+                            ledger=ledger,
+                            stats=stats,
+                            replica=replica,
+                        )
+                    print([x.text for x in responses], flush=True)
+                except Exception as e:
+                    # one bad tick doesn't end the daemon, the ledger has the next one catch up
+                    print(f"Tick at {next_tick} failed: {e!r}", flush=True)
+                profile = None
+                if metrics is not None:
+                    metrics.stats = stats
+                if cache.dirty:
+                    cache.save(cache_path)
+                # a tick that overran a boundary skips to the next one instead of firing twice,
+                # the ledger makes the next tick catch up on the skipped minutes
+                next_tick = max(
+                    next_tick + timedelta(minutes=1),
+                    floor_minute(datetime.now(timezone.utc)) + timedelta(minutes=1),
+                )
+    finally:
+        if ledger is not None:
+            ledger.close()
+        if replica is not None:
+            replica.close()
+        if metrics is not None:
+            metrics.close()
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)
+
+
+# tenant groups ticking at the same time
+TENANT_CONCURRENCY: int = 4
+# connections kept to each ntfy host, shared by all tenants
+TENANT_POOL_SIZE: int = 32
+
+
+@dataclass
+class Tenant:
+    name: str
+    config: Config
+
+    @property
+    def ledger_path(self) -> Path:
+        # tenants can share a repo but not a ledger, a claim by one would hide the notification from the other
+        return self.config.base_dir / f".org-notifier-ledger.{self.name}.sqlite"
+
+
+def load_tenants(path: Path) -> tuple[list[Tenant], dict[str, Any]]:
+    """Tenants and process-wide settings from a tenants file:
+    {"tenants": [{"name": ..., "base_dir": ..., "ntfy_url": ..., <config keys>}], "concurrency": 4, "pool_size": 32}
+    A tenant's config keys override those of its repo's .org-notifier-config.json.
+    """
+    with open(path, "r") as f:
+        tenants_config: dict[str, Any] = json.load(f)
+    tenants: list[Tenant] = [
+        Tenant(
+            name=x["name"],
+            config=load_config(
+                org_basedir=x["base_dir"],
+                url=x["ntfy_url"],
+                overrides={
+                    key: value
+                    for key, value in x.items()
+                    if key not in ("name", "base_dir", "ntfy_url")
+                },
+            ),
+        )
+        for x in tenants_config["tenants"]
+    ]
+    if len({x.name for x in tenants}) != len(tenants):
+        raise ValueError(f"Tenant names in {path} must be unique")
+    return tenants, {
+        "concurrency": tenants_config.get("concurrency", TENANT_CONCURRENCY),
+        "pool_size": tenants_config.get("pool_size", TENANT_POOL_SIZE),
+    }
+
+
+class TenantGroup:
+    """The tenants of one org repo. They share its parse cache, so their ticks run one after another,
+    each with its own ledger and ntfy url."""
+
+    def __init__(self, tenants: list[Tenant]):
+        self.tenants: list[Tenant] = tenants
+        config: Config = tenants[0].config
+        self.cache_path: Path = config.cache_path
+        self.cache: ParseCache = ParseCache.load(
+            self.cache_path,
+            use_hash=config.cache_content_hash,
+            prescan=config.prescan,
+            stream_threshold=config.stream_threshold,
+        )
+        self.ledgers: dict[str, Ledger | None] = {
+            x.name: Ledger(x.ledger_path) if x.config.ledger else None for x in tenants
+        }
+        # how long the last tick took, shorter groups are started first
+        self.duration: float = 0.0
+        self.future: Future | None = None
+
+    def tick(
+        self, time: datetime, session: requests.Session
+    ) -> dict[str, list[requests.Response]]:
+        started: float = perf_counter()
+        try:
+            return {
+                x.name: run_tick(
+                    config=x.config,
+                    time=time,
+                    session=session,
+                    cache=self.cache,
+                    ledger=self.ledgers[x.name],
+                )
+                for x in self.tenants
+            }
+        finally:
+            if self.cache.dirty:
+                self.cache.save(self.cache_path)
+            self.duration = perf_counter() - started
+
+    def close(self) -> None:
+        for ledger in self.ledgers.values():
+            if ledger is not None:
+                ledger.close()
+
+
+def group_tenants(tenants: list[Tenant]) -> list[TenantGroup]:
+    by_repo: dict[Path, list[Tenant]] = {}
+    for tenant in tenants:
+        if not tenant.config:
+            print(f"Skipping tenant {tenant.name!r}, its config is incomplete")
+            continue
+        by_repo.setdefault(tenant.config.base_dir.resolve(), []).append(tenant)
+    return [TenantGroup(x) for x in by_repo.values()]
+
+
+def schedule_tenants(
+    groups: list[TenantGroup],
+    time: datetime,
+    session: requests.Session,
+    executor: ThreadPoolExecutor,
+) -> None:
+    """Start the tick at `time` of every group that isn't still busy with an earlier one, shortest first.
+    A busy group skips the tick and its ledgers catch up on it next time, it never holds back the others.
+    """
+    for group in sorted(groups, key=lambda x: x.duration):
+        if group.future is not None and not group.future.done():
+            print(
+                f"Tenants {[x.name for x in group.tenants]} still busy, skipping the tick at {time}"
+            )
+            continue
+        if group.future is not None and group.future.exception() is not None:
+            print(
+                f"Tick of tenants {[x.name for x in group.tenants]} failed: {group.future.exception()!r}"
+            )
+        group.future = executor.submit(group.tick, time, session)
+
+
+def run_tenants(
+    tenants_path: str, daemon: bool = True, stop: threading.Event | None = None
+):
+    """main() or run_daemon() for every tenant of a tenants file, in one process with one HTTP pool.
+    Tenant groups tick in parallel (up to "concurrency" at a time)."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    tenants, settings = load_tenants(Path(tenants_path))
+    groups: list[TenantGroup] = group_tenants(tenants)
+    stop = stop if stop is not None else threading.Event()
+    previous_handlers = (
+        {
+            signum: signal.signal(signum, lambda *_: stop.set())
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+        if daemon
+        else {}
+    )
+    try:
+        with (
+            create_session(settings["pool_size"]) as session,
+            ThreadPoolExecutor(max_workers=settings["concurrency"]) as executor,
+        ):
+            if not daemon:
+                schedule_tenants(groups, datetime.now(timezone.utc), session, executor)
+                for group in groups:
+                    print(
+                        {
+                            name: [x.text for x in responses]
+                            for name, responses in group.future.result().items()
+                        }
+                    )
+                return
+            next_tick: datetime = floor_minute(datetime.now(timezone.utc)) + timedelta(
+                minutes=1
+            )
+            while not stop.wait(seconds_until(next_tick, datetime.now(timezone.utc))):
+                schedule_tenants(groups, next_tick, session, executor)
+                next_tick = max(
+                    next_tick + timedelta(minutes=1),
+                    floor_minute(datetime.now(timezone.utc)) + timedelta(minutes=1),
+                )
+            for group in groups:
+                if group.future is not None:
+                    group.future.result()
+    finally:
+        for group in groups:
+            group.close()
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="org-notifier")
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="stay resident and tick on every minute boundary",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="dump cProfile stats of one tick (the first one with --daemon) to PATH",
+    )
+    parser.add_argument(
+        "--agenda",
+        nargs=2,
+        metavar=("FROM", "TO"),
+        help="print what will fire from FROM to TO (ISO times, 'now', TO may be an offset like 7d) and exit",
+    )
+    parser.add_argument(
+        "--replay",
+        nargs=2,
+        metavar=("FROM", "TO"),
+        help="run every tick from FROM to TO (as --agenda) on a simulated clock, recording instead of sending, and exit",
+    )
+    parser.add_argument(
+        "--step",
+        default="1m",
+        help="minutes between the ticks of --replay, or a duration like 1h (default 1m)",
+    )
+    parser.add_argument(
+        "--tenants",
+        metavar="PATH",
+        help="serve every tenant of a tenants file instead of NTFY_URL/ORG_BASEDIR",
+    )
+    args = parser.parse_args()
     url: str | None = os.getenv("NTFY_URL")
     org_basedir: str | None = os.getenv("ORG_BASEDIR")
-    if url and org_basedir:
-        main(url, org_basedir)
+    if args.tenants:
+        run_tenants(args.tenants, daemon=args.daemon)
+    elif url and org_basedir:
+        if args.agenda:
+            show_agenda(url, org_basedir, *args.agenda)
+        elif args.replay:
+            show_replay(url, org_basedir, *args.replay, step=args.step)
+        elif args.daemon:
+            run_daemon(url, org_basedir, profile=args.profile)
+        else:
+            main(url, org_basedir, profile=args.profile)
     else:
         raise Exception(
             f'Supply environment variable(s): {None if url else "url"} {None if org_basedir else "org_basedir"}'
@@ -1,17 +1,64 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import os
+import sys
+import subprocess
 from pathlib import Path
+from dataclasses import replace
 from typing import Generator
+from collections.abc import Callable
 from dateutil.relativedelta import relativedelta
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
 import pytest
+from concurrent.futures import ThreadPoolExecutor
+import requests
 from orgparse.node import OrgNode, OrgRootNode
 from src.main import (
     Config,
+    Ledger,
+    group_tenants,
+    load_tenants,
+    schedule_tenants,
+    CircuitBreaker,
+    BREAKER_THRESHOLD,
+    OUTBOX_CLAIM,
+    MetricsServer,
+    TickStats,
     generate_deadline_notification_intervals,
     generate_scheduled_notification_intervals,
-    get_valid_nodes,
+    generate_reminder_intervals,
     node_and_time_for_notification,
+    Notification,
+    ParseCache,
+    coalesce_notifications,
+    collect_notifications,
+    stream_node_times,
+    with_body,
+    prescan_could_fire,
+    build_schedule,
+    create_session,
+    deliver_notifications,
+    discover_org_files,
+    find_org_files,
+    load_config,
+    agenda,
+    format_agenda,
+    nodes_and_time_for_notification,
+    nodes_and_times_between,
+    ReminderTable,
     parse_file,
+    run_tick,
+    get_timed_nodes,
+    series_between,
+    run_daemon,
+    seconds_until,
+    HashRing,
+    Replica,
+    SqliteCoordinator,
+    replay,
+    RecordingSession,
 )
 
 
@@ -26,11 +73,82 @@ def temp_dir() -> Generator[Path, None, None]:
     rmtree(path)
 
 
+@pytest.fixture(autouse=True)
+def cache_home(monkeypatch, tmp_path: Path) -> Path:
+    # parse caches go to the user's cache dir, never the real one during tests
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+
 @pytest.fixture
 def ntfy_url() -> str:
     return str(os.getenv("NTFY_URL"))
 
 
+class StubNtfyHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"] or 0))
+        self.server.received.append((dict(self.headers), body.decode()))
+        time.sleep(self.server.delay)
+        self.send_response(self.server.status)
+        for key, value in self.server.headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_ntfy() -> Generator[ThreadingHTTPServer, None, None]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubNtfyHandler)
+    server.received = []
+    server.delay = 0.0
+    server.status = 200
+    server.headers = {}
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/test"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+# when the org files written by scheduled_org are due, wall clock time
+EVENT = datetime(year=2025, month=2, day=14, hour=9, minute=0)
+ScheduledOrg = Callable[..., tuple[Path, Config]]
+
+
+@pytest.fixture
+def scheduled_org(temp_dir: Path, stub_ntfy: ThreadingHTTPServer) -> ScheduledOrg:
+    """Writes an org file with one heading SCHEDULED at EVENT (and `rest` after it), returns its path
+    and a config for its directory with the default reminders that delivers to stub_ntfy
+    """
+
+    def write(
+        heading: str,
+        name: str = "tasks.org",
+        base_dir: Path = temp_dir,
+        repeater: str | None = None,
+        rest: str = "",
+    ) -> tuple[Path, Config]:
+        base_dir.mkdir(exist_ok=True)
+        path = base_dir / name
+        timestamp = EVENT.strftime("%Y-%m-%d %a %H:%M") + (
+            f" {repeater}" if repeater else ""
+        )
+        path.write_text(f"\n* TODO {heading}\n  SCHEDULED: <{timestamp}>\n{rest}")
+        config = Config(
+            base_dir=base_dir,
+            reminder_intervals=generate_scheduled_notification_intervals(),
+            ntfy_url=stub_ntfy.url,
+        )
+        return path, config
+
+    return write
+
+
 @pytest.fixture
 def test_time() -> datetime:
     return datetime.now()
@@ -189,15 +307,8 @@ def test_parse_file(test_org_file: Path):
     assert isinstance(node, OrgRootNode)
 
 
-def test_get_valid_nodes(test_org_file: Path):
-    node = parse_file(path=test_org_file)
-    assert len(get_valid_nodes(node)) == 37
-
-
 def test_node_for_notification(test_org_file: Path, test_time: datetime):
     org_tree_root: OrgRootNode = parse_file(path=test_org_file)
-    valid_nodes: list[OrgNode] = get_valid_nodes(org_tree_root)
-    [print(f"{ x.heading }, { x.datelist }, { x.has_date() }") for x in valid_nodes]
     intervals: dict[str, list[timedelta]] = {
         "scheduled": generate_scheduled_notification_intervals(),
         "deadline": generate_deadline_notification_intervals(),
@@ -254,7 +365,1040 @@ def test_notification_bug(test_early_notification_bug: Path):
     nodes: list[tuple[OrgNode, datetime]] = node_and_time_for_notification(
         time=test_time, node=org_tree_root, reminder_intervals=intervals
     )
-    valid_nodes = get_valid_nodes(org_tree_root)
-    assert len(valid_nodes) == 1
-    print(valid_nodes)
     assert not any("Test bug org node 1" == node[0].heading for node in nodes)
+
+
+def test_parse_cache(test_org_file: Path):
+    cache = ParseCache()
+    first = cache.get(test_org_file)
+    assert cache.get(test_org_file) is first
+    assert len(first.nodes) == 34
+    stat = test_org_file.stat()
+    os.utime(test_org_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert cache.get(test_org_file) is not first
+
+
+def test_parse_cache_content_hash(test_org_file: Path):
+    cache = ParseCache(use_hash=True)
+    first = cache.get(test_org_file)
+    stat = test_org_file.stat()
+    os.utime(test_org_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert cache.get(test_org_file) is first
+    test_org_file.write_text(test_org_file.read_text() + "* TODO new node\n")
+    assert cache.get(test_org_file) is not first
+
+
+def test_parse_cache_persistence(test_org_file: Path, temp_dir: Path):
+    cache_path = temp_dir / "cache.pickle"
+    cache = ParseCache()
+    headings = [x.heading for x in cache.get(test_org_file).nodes]
+    cache.save(cache_path)
+    assert not cache.dirty
+    loaded = ParseCache.load(cache_path)
+    assert test_org_file in loaded.entries
+    assert [x.heading for x in loaded.get(test_org_file).nodes] == headings
+    assert not loaded.dirty
+    loaded.prune([])
+    assert not loaded.entries
+    cache_path.write_bytes(b"not a pickle")
+    assert not ParseCache.load(cache_path).entries
+
+
+def test_cache_path_outside_repo(temp_dir: Path, cache_home: Path, ntfy_url: str):
+    config = Config(base_dir=temp_dir, reminder_intervals=None, ntfy_url=ntfy_url)
+    assert config.cache_path.parent == cache_home / "org-notifier"
+    assert config.cache_path.name.startswith("test_temp-")
+    # a repo's config can't point the cache into the repo
+    (temp_dir / ".org-notifier-config.json").write_text('{"cache_dir": "."}')
+    assert load_config(str(temp_dir), ntfy_url).cache_path == config.cache_path
+    other = replace(config, base_dir=temp_dir / "other")
+    assert other.cache_path != config.cache_path
+    sharded = replace(config, coordination="flock", coordination_mode="shard")
+    assert (
+        replace(sharded, replica="a").cache_path
+        != replace(sharded, replica="b").cache_path
+    )
+
+
+def test_seconds_until():
+    now = datetime(year=2025, month=2, day=14, hour=9, minute=0, second=45)
+    assert seconds_until(datetime(2025, 2, 14, 9, 1), now) == 15.0
+    assert seconds_until(datetime(2025, 2, 14, 9, 0), now) == 0.0
+
+
+def test_run_daemon_stops(temp_dir: Path):
+    stop = threading.Event()
+    stop.set()
+    run_daemon(url="http://localhost", org_basedir=str(temp_dir), stop=stop)
+
+
+def test_run_daemon_survives_failed_ticks(temp_dir: Path, monkeypatch):
+    import src.main
+
+    stop = threading.Event()
+    ticks = []
+
+    def failing_tick(**kwargs):
+        ticks.append(kwargs["time"])
+        if len(ticks) == 2:
+            stop.set()
+        raise OSError("unreadable file")
+
+    monkeypatch.setattr(src.main, "run_tick", failing_tick)
+    monkeypatch.setattr(src.main, "seconds_until", lambda *_: 0.0)
+    run_daemon(url="http://localhost", org_basedir=str(temp_dir), stop=stop)
+    assert len(ticks) == 2
+
+
+def test_run_daemon_waits_for_repo(temp_dir: Path, monkeypatch):
+    import src.main
+
+    stop = threading.Event()
+    base_dir = temp_dir / "orgfiles"
+    loads = []
+    ticks = []
+
+    def cloning_load_config(**kwargs):
+        # the repo shows up while the daemon waits, as after a clone at boot
+        loads.append(kwargs["org_basedir"])
+        if len(loads) == 3:
+            base_dir.mkdir()
+        return load_config(**kwargs)
+
+    def tick(**kwargs):
+        ticks.append(kwargs["time"])
+        stop.set()
+        return []
+
+    monkeypatch.setattr(src.main, "load_config", cloning_load_config)
+    monkeypatch.setattr(src.main, "run_tick", tick)
+    monkeypatch.setattr(src.main, "seconds_until", lambda *_: 0.0)
+    run_daemon(url="http://localhost", org_basedir=str(base_dir), stop=stop)
+    assert len(loads) == 3 and len(ticks) == 1
+
+
+def test_schedule_matches_scan(test_org_file: Path, test_time: datetime):
+    org_tree_root: OrgRootNode = parse_file(path=test_org_file)
+    intervals: dict[str, list[timedelta]] = {
+        "scheduled": generate_scheduled_notification_intervals(),
+        "deadline": generate_deadline_notification_intervals(),
+    }
+    schedule = build_schedule(
+        nodes=get_timed_nodes(org_tree_root),
+        start=test_time.replace(second=0, microsecond=0),
+        reminder_intervals=intervals,
+    )
+    for minutes in range(0, 180, 3):
+        time = test_time + timedelta(minutes=minutes)
+        scanned = node_and_time_for_notification(
+            time=time, node=org_tree_root, reminder_intervals=intervals
+        )
+        assert sorted(x[0].heading for x in schedule.at(time)) == sorted(
+            x[0].heading for x in scanned
+        )
+
+
+def test_agenda(
+    temp_dir: Path, test_org_file: Path, ntfy_url: str, test_time: datetime
+):
+    config = load_config(str(temp_dir), ntfy_url)
+    cache = ParseCache(prescan=True)
+    start = test_time.astimezone().replace(second=0, microsecond=0)
+    entries = agenda(config, start, start + timedelta(days=7), cache=cache)
+    assert entries and all(
+        start <= x.fire_time < start + timedelta(days=7) for x in entries
+    )
+    assert [x.fire_time for x in entries] == sorted(x.fire_time for x in entries)
+    nodes = get_timed_nodes(parse_file(path=test_org_file))
+    for minutes in range(0, 180, 7):
+        time = start + timedelta(minutes=minutes)
+        scanned = nodes_and_time_for_notification(
+            time=time, valid_nodes=nodes, reminder_intervals=config.reminders
+        )
+        assert sorted(x.node.heading for x in entries if x.fire_time == time) == sorted(
+            x[0].heading for x in scanned
+        )
+    assert format_agenda(entries[:1], temp_dir).endswith("(test.org)")
+    # with a tick's index covering part of the window, the rest is indexed on either side of it
+    cache.schedule(test_org_file, start + timedelta(hours=1), config.reminders)
+    assert [
+        (x.fire_time, x.event, x.node.heading, x.match)
+        for x in agenda(config, start, start + timedelta(days=7), cache=cache)
+    ] == [(x.fire_time, x.event, x.node.heading, x.match) for x in entries]
+    # a query far ahead doesn't hold back the ticks' periodic rescan
+    agenda(config, start + timedelta(days=30), start + timedelta(days=31), cache=cache)
+    assert cache.scan_state.full_scan_at <= datetime.now(timezone.utc)
+    both = temp_dir / "both.org"
+    both.write_text(
+        "* TODO Both\n  SCHEDULED: <2030-01-01 Tue 09:00> DEADLINE: <2030-01-01 Tue 09:00>\n"
+    )
+    due = datetime(2030, 1, 1, 9).astimezone()
+    assert sorted(
+        x.kind
+        for x in agenda(config, due, due + timedelta(minutes=1), cache=cache)
+        if x.node.heading == "Both"
+    ) == ["DEADLINE", "SCHEDULED"]
+
+
+def test_parse_cache_schedule(test_org_file: Path, test_time: datetime):
+    intervals: dict[str, list[timedelta]] = {
+        "scheduled": generate_scheduled_notification_intervals(),
+        "deadline": generate_deadline_notification_intervals(),
+    }
+    cache = ParseCache()
+    schedule = cache.schedule(test_org_file, test_time, intervals)
+    assert any("Test org node 22" == x[0].heading for x in schedule.at(test_time))
+    later = test_time + timedelta(hours=47)
+    assert cache.schedule(test_org_file, later, intervals) is schedule
+    assert (
+        cache.schedule(test_org_file, later + timedelta(hours=2), intervals)
+        is not schedule
+    )
+    # tenants with other reminders or zones keep their own index of the shared file
+    schedule = cache.schedule(test_org_file, test_time, intervals)
+    utc = ReminderTable.compile(intervals, None, "UTC")
+    other = cache.schedule(test_org_file, test_time, utc)
+    assert other is not schedule
+    assert cache.schedule(test_org_file, test_time, intervals) is schedule
+    assert cache.schedule(test_org_file, test_time, utc) is other
+
+
+def test_prescan_skips_files_with_nothing_due(
+    temp_dir: Path, test_org_file: Path, test_time: datetime
+):
+    intervals: dict[str, list[timedelta]] = generate_reminder_intervals()
+    end = test_time + timedelta(hours=48)
+    old = b"* TODO Old\n  SCHEDULED: <2001-01-01 Mon 10:00>\n"
+    yearly = (
+        b"* TODO Yearly\n  <2001-%s +1y>\n"
+        % test_time.strftime("%m-%d %a %H:%M").encode()
+    )
+    assert not prescan_could_fire(old, test_time, end, intervals)
+    assert prescan_could_fire(yearly, test_time, end, intervals)
+    assert prescan_could_fire(test_org_file.read_bytes(), test_time, end, intervals)
+
+    path = temp_dir / "later.org"
+    due = test_time + timedelta(days=7)
+    path.write_text(
+        "* TODO Later\n  SCHEDULED: <%s>\n" % due.strftime("%Y-%m-%d %a %H:%M")
+    )
+    cache = ParseCache(prescan=True)
+    assert cache.schedule(path, test_time, intervals).at(test_time) == []
+    assert cache.entries[path].skipped_until is not None
+    assert cache.entries[path].nodes == []
+    firing = cache.schedule(path, due, intervals).at(due)
+    assert [x[0].heading for x in firing] == ["Later"]
+    assert cache.entries[path].skipped_until is None
+
+
+def test_configured_reminders(temp_dir: Path, ntfy_url: str, test_time: datetime):
+    (temp_dir / ".org-notifier-config.json").write_text(
+        json.dumps(
+            {
+                "reminder_intervals": {"scheduled": ["2h"], "deadline": ["1d"]},
+                "tag_reminders": {"urgent": "deadline=3h"},
+            }
+        )
+    )
+    config = load_config(str(temp_dir), ntfy_url)
+    assert config
+    stamp = lambda x: (test_time + x).strftime("%Y-%m-%d %a %H:%M")
+    path = temp_dir / "reminders.org"
+    path.write_text(
+        "#+REMINDERS: scheduled=30m\n"
+        f"* TODO File\n  SCHEDULED: <{stamp(timedelta(minutes=30))}>\n"
+        f"* TODO Repo :urgent:\n  DEADLINE: <{stamp(timedelta(days=1))}>\n"
+        f"* TODO Tag :urgent:\n  DEADLINE: <{stamp(timedelta(hours=3))}>\n"
+        f"* TODO Node :urgent:\n  DEADLINE: <{stamp(timedelta(days=2))}>\n"
+        "  :PROPERTIES:\n  :REMINDERS: 2d\n  :END:\n"
+        f"* TODO Default\n  SCHEDULED: <{stamp(timedelta(minutes=15))}>\n"
+    )
+    expected = ["File", "Tag", "Node"]
+    scanned = collect_notifications(
+        path, test_time, reminder_intervals=config.reminders
+    )
+    assert sorted(x.title for x in scanned) == sorted(expected)
+    streamed = collect_notifications(
+        path, test_time, reminder_intervals=config.reminders, stream_threshold=0
+    )
+    assert [x.title for x in streamed] == [x.title for x in scanned]
+    indexed = collect_notifications(
+        path,
+        test_time,
+        cache=ParseCache(prescan=True),
+        reminder_intervals=config.reminders,
+    )
+    assert sorted(x.title for x in indexed) == sorted(expected)
+
+
+def test_dst_transitions(temp_dir: Path, ntfy_url: str):
+    table = ReminderTable.compile(None, None, "America/New_York")
+    path = temp_dir / "dst.org"
+    path.write_text(
+        "* TODO Daily\n  SCHEDULED: <2025-03-07 Fri 09:00 +1d>\n"
+        "* TODO Hourly\n  SCHEDULED: <2025-11-01 Sat 20:30 +1h>\n"
+        "* TODO Tokyo\n  :PROPERTIES:\n  :TIMEZONE: Asia/Tokyo\n  :END:\n"
+        "  <2025-03-09 Sun 09:00>\n"
+    )
+    nodes = get_timed_nodes(parse_file(path=path))
+    assert nodes == [with_body(path, x) for x in stream_node_times(path)]
+    utc = lambda *x: datetime(*x, tzinfo=timezone.utc)
+
+    def fired(heading: str, start: datetime, end: datetime) -> list[datetime]:
+        return [
+            x[0]
+            for x in nodes_and_times_between(start, end, nodes, table)
+            if x[1].heading == heading and x[0] == x[2].astimezone(timezone.utc)
+        ]
+
+    # 09:00 local on both sides of the spring forward, an hour earlier in UTC
+    assert fired("Daily", utc(2025, 3, 8), utc(2025, 3, 11)) == [
+        utc(2025, 3, 8, 14),
+        utc(2025, 3, 9, 13),
+        utc(2025, 3, 10, 13),
+    ]
+    assert fired("Tokyo", utc(2025, 3, 8), utc(2025, 3, 10)) == [utc(2025, 3, 9, 0)]
+    # the repeated hour of the fall back doesn't fire twice
+    hourly = fired("Hourly", utc(2025, 11, 2, 3), utc(2025, 11, 2, 9))
+    assert len(hourly) == len(set(hourly)) == 5
+    assert utc(2025, 11, 2, 6, 30) not in hourly
+    schedule = build_schedule(nodes, utc(2025, 11, 1, 12), table)
+    for minutes in range(0, 24 * 60, 5):
+        time = utc(2025, 11, 1, 12) + timedelta(minutes=minutes)
+        assert [x[0].heading for x in schedule.at(time)] == [
+            x[0].heading for x in nodes_and_time_for_notification(time, nodes, table)
+        ]
+    with pytest.raises(ValueError, match="Unknown time zone 'Mars/Olympus_Mons'"):
+        load_config(str(temp_dir), ntfy_url, {"timezone": "Mars/Olympus_Mons"})
+
+
+def test_timestamp_forms(temp_dir: Path):
+    table = ReminderTable.compile(None, None, "UTC")
+    path = temp_dir / "forms.org"
+    path.write_text(
+        "* TODO Range\n  <2025-03-10 Mon 10:00>--<2025-03-12 Wed 12:00>\n"
+        "* TODO Weekly\n  <2025-02-24 Mon 09:30 +1w>\n"
+        "* TODO Restart\n  SCHEDULED: <2025-03-01 Sat 08:00 .+1d>\n"
+        "* TODO Delayed\n  SCHEDULED: <2025-03-09 Sun 12:00 -1d>\n"
+        "* TODO Deadline\n  DEADLINE: <2025-02-28 Fri 17:00 +1w>\n"
+        "* TODO Prop\n  :PROPERTIES:\n  :APPT: <2025-03-11 Tue 15:00>\n  :END:\n"
+        "* TODO Float\n  <%%(diary-float t 2 2) 16:00>\n"
+        "* TODO Birthday\n  <%%(diary-anniversary 3 11 1990) 18:00>\n"
+        # reported and skipped
+        "* TODO Unsupported\n  <%%(diary-float t 1 t) 09:00>\n"
+        "  <%%(diary-anniversary 3 11 t)> <%%(diary-block 2 30 2025 3 1 2025)>\n"
+    )
+    nodes = get_timed_nodes(parse_file(path=path))
+    assert nodes == [with_body(path, x) for x in stream_node_times(path)]
+    utc = lambda *x: datetime(*x, tzinfo=timezone.utc)
+    start, end = utc(2025, 3, 9), utc(2025, 3, 13)
+    assert [
+        (x[1].heading, x[0])
+        for x in nodes_and_times_between(start, end, nodes, table)
+        if x[0] == x[2].astimezone(timezone.utc)
+    ] == [
+        ("Weekly", utc(2025, 3, 10, 9, 30)),
+        ("Range", utc(2025, 3, 10, 10)),
+        ("Delayed", utc(2025, 3, 10, 12)),
+        ("Prop", utc(2025, 3, 11, 15)),
+        ("Float", utc(2025, 3, 11, 16)),
+        ("Birthday", utc(2025, 3, 11, 18)),
+    ]
+    # a repeating deadline fires a week on, a restarting repeater only at its basis
+    assert [
+        x[1].heading
+        for x in nodes_and_times_between(utc(2025, 3, 1), start, nodes, table)
+        if x[0] == x[2].astimezone(timezone.utc)
+    ] == ["Restart", "Weekly", "Deadline"]
+    schedule = build_schedule(nodes, start, table, end - start)
+    for minutes in range(0, 4 * 24 * 60, 15):
+        time = start + timedelta(minutes=minutes)
+        assert [x[0].heading for x in schedule.at(time)] == [
+            x[0].heading for x in nodes_and_time_for_notification(time, nodes, table)
+        ]
+    assert prescan_could_fire(path.read_bytes(), utc(2030, 1, 1), utc(2030, 1, 2), None)
+
+
+def test_stream_node_times(temp_dir: Path, test_org_file: Path, test_time: datetime):
+    streamed = list(stream_node_times(test_org_file))
+    assert all(x.body == "" and x.body_offset is not None for x in streamed)
+    assert [with_body(test_org_file, x) for x in streamed] == get_timed_nodes(
+        parse_file(test_org_file)
+    )
+    path = temp_dir / "stream.org"
+    path.write_text(f"""#+FILETAGS: :journal:
+#+TODO: WAIT | GONE
+* GONE Gone node
+  <{test_time.strftime('%Y-%m-%d %a %H:%M')}>
+* WAIT Waiting node :a:
+  :PROPERTIES:
+  :CREATED: <2001-01-01 Mon>
+  :END:
+  <{test_time.strftime('%Y-%m-%d %a %H:%M')}>
+""")
+    assert [with_body(path, x) for x in stream_node_times(path)] == get_timed_nodes(
+        parse_file(path)
+    )
+    notifications = collect_notifications(path, test_time, stream_threshold=0)
+    assert [x.title for x in notifications] == ["Waiting node"]
+    assert notifications == collect_notifications(path, test_time)
+    cache = ParseCache(stream_threshold=0)
+    assert collect_notifications(path, test_time, cache=cache) == (
+        collect_notifications(path, test_time)
+    )
+
+
+def test_series_between_relativedelta():
+    def in_series(basis, interval, time):
+        return time in series_between(
+            basis, interval, time, time + timedelta(minutes=1)
+        )
+
+    basis = datetime(year=2025, month=1, day=31, hour=9, minute=0)
+    monthly = relativedelta(months=1)
+    assert in_series(basis, monthly, datetime(2025, 2, 28, 9, 0))
+    assert in_series(basis, monthly, datetime(2025, 3, 31, 9, 0))
+    assert not in_series(basis, monthly, datetime(2025, 3, 28, 9, 0))
+    assert not in_series(basis, monthly, datetime(2024, 12, 31, 9, 0))
+    assert in_series(basis, relativedelta(years=1), datetime(3025, 1, 31, 9, 0))
+    assert not in_series(basis, relativedelta(months=2), datetime(2025, 2, 28, 9, 0))
+    # negative (warning) intervals count forward from the basis like timedeltas do, and terminate
+    assert in_series(basis, -monthly, datetime(2025, 4, 30, 9, 0))
+    assert not in_series(basis, -monthly, datetime(2024, 12, 31, 9, 0))
+    assert in_series(basis, -timedelta(hours=1), basis + timedelta(hours=5))
+
+
+def test_parse_cache_refresh_process_pool(
+    test_org_file: Path, test_early_notification_bug: Path, test_time: datetime
+):
+    intervals: dict[str, list[timedelta]] = {
+        "scheduled": generate_scheduled_notification_intervals(),
+        "deadline": generate_deadline_notification_intervals(),
+    }
+    cache = ParseCache()
+    cache.refresh(
+        paths=[test_org_file, test_early_notification_bug],
+        time=test_time,
+        reminder_intervals=intervals,
+        workers=2,
+    )
+    schedule = cache.entries[test_org_file].schedules[ReminderTable.compile(intervals)]
+    assert cache.schedule(test_org_file, test_time, intervals) is schedule
+    assert any("Test org node 22" == x[0].heading for x in schedule.at(test_time))
+    assert cache.lookup(test_early_notification_bug) is not None
+
+
+def test_deliver_notifications_concurrently(stub_ntfy: ThreadingHTTPServer):
+    stub_ntfy.delay = 0.3
+    now = datetime.now()
+    notifications = [
+        Notification(
+            title=f"node {i}", priority="default", tags="", message="body", time=now
+        )
+        for i in range(10)
+    ]
+    started = time.monotonic()
+    with create_session(10) as session:
+        delivered = deliver_notifications(
+            notifications, stub_ntfy.url, now, session=session, concurrency=10
+        )
+    assert time.monotonic() - started < 10 * 0.3
+    assert [x[0] for x in delivered] == notifications
+    assert [x[1].text for x in delivered] == ["ok"] * 10
+    assert sorted(x[0]["Title"] for x in stub_ntfy.received) == sorted(
+        f"node {i} (now)" for i in range(10)
+    )
+
+
+def test_coalesce_notifications():
+    now = datetime(year=2025, month=2, day=14, hour=9, minute=0)
+
+    def notification(title: str, source: str, priority: str = "default"):
+        return Notification(
+            title=title,
+            priority=priority,
+            tags="work",
+            message="body",
+            time=now + timedelta(minutes=15),
+            source=source,
+        )
+
+    notifications = [
+        notification("a", "/org/work.org"),
+        notification("b", "/org/home.org"),
+        notification("c", "/org/work.org", priority="urgent"),
+        notification("d", "/org/work.org"),
+        notification("e", "/org/work.org"),
+    ]
+    assert coalesce_notifications(notifications, now, None, 2) == notifications
+    coalesced = coalesce_notifications(notifications, now, "file", 2)
+    assert [x.title for x in coalesced] == ["3 reminders: work", "b", "c"]
+    assert coalesced[0].members == [notifications[0], *notifications[3:]]
+    assert coalesced[0].message.splitlines() == [
+        "a (in 15 minutes)",
+        "d (in 15 minutes)",
+        "e (in 15 minutes)",
+    ]
+    assert [x.title for x in coalesce_notifications(notifications, now, "tag", 5)] == [
+        "a",
+        "b",
+        "c",
+        "d",
+        "e",
+    ]
+    assert [
+        x.title for x in coalesce_notifications(notifications, now, "priority", 2)
+    ] == ["4 reminders: default", "c"]
+    tagged = [
+        Notification(
+            title=title, priority="default", tags=tags, message="body", time=now
+        )
+        for title, tags in [
+            ("f", "work"),
+            ("g", "home,work"),
+            ("h", "work"),
+            ("i", "errand,home"),
+            ("j", "errand"),
+            ("k", ""),
+        ]
+    ]
+    # one digest per notification, under the tag most of them share (alphabetical on a tie)
+    coalesced = coalesce_notifications(tagged, now, "tag", 2)
+    assert [x.title for x in coalesced] == [
+        "3 reminders: work",
+        "2 reminders: errand",
+        "k",
+    ]
+    assert coalesced[0].members == tagged[:3]
+
+
+def test_deliver_notifications_timeout(stub_ntfy: ThreadingHTTPServer):
+    stub_ntfy.delay = 1.0
+    now = datetime.now()
+    notification = Notification(
+        title="slow", priority="default", tags="", message="body", time=now
+    )
+    with create_session(1) as session:
+        delivered = deliver_notifications(
+            [notification], stub_ntfy.url, now, session, concurrency=1, timeout=0.2
+        )
+    assert delivered == [(notification, None)]
+
+
+def test_find_org_files_prunes_ignored_dirs(temp_dir: Path):
+    (temp_dir / ".git" / "objects").mkdir(parents=True)
+    (temp_dir / ".git" / "objects" / "stale.org").write_text("* TODO ignored\n")
+    (temp_dir / "notes").mkdir()
+    (temp_dir / "notes" / "todo.org").write_text("* TODO found\n")
+    (temp_dir / "notes" / "todo.txt").write_text("not org\n")
+    assert find_org_files(temp_dir, Config.ignore_dirs) == [
+        temp_dir / "notes" / "todo.org"
+    ]
+
+
+def test_discover_org_files_git(temp_dir: Path, ntfy_url: str, test_time: datetime):
+    def git(*args: str):
+        subprocess.run(
+            ["git", "-C", str(temp_dir), "-c", "user.name=t", "-c", "user.email=t@t"]
+            + list(args),
+            check=True,
+            capture_output=True,
+        )
+
+    git("init", "-q")
+    (temp_dir / "a.org").write_text("* TODO a\n")
+    git("add", "-A")
+    git("commit", "-q", "-m", "a")
+    config = Config(
+        base_dir=temp_dir,
+        reminder_intervals=generate_scheduled_notification_intervals(),
+        ntfy_url=ntfy_url,
+    )
+    cache = ParseCache()
+    # discovery runs on the aware UTC time of the ticks
+    now = config.reminders.utc(test_time)
+    files = discover_org_files(config, cache, now)
+    assert files == [temp_dir / "a.org"]
+    assert discover_org_files(config, cache, now) == files
+    (temp_dir / "b.org").write_text("* TODO b\n")
+    (temp_dir / "a.org").unlink()
+    git("add", "-A")
+    git("commit", "-q", "-m", "b")
+    files = discover_org_files(config, cache, now)
+    assert files == [temp_dir / "b.org"]
+    # an uncommitted edit to a cached file leaves HEAD alone but is still picked up by the next tick
+    session = RecordingSession()
+    run_tick(config=config, time=test_time, session=session, cache=cache)
+    assert session.take() == []
+    (temp_dir / "b.org").write_text(
+        f"* TODO b\nSCHEDULED: <{test_time:%Y-%m-%d %a %H:%M}>\n"
+    )
+    run_tick(config=config, time=test_time, session=session, cache=cache)
+    assert [x[0] for x in session.take()] == ["b (now)"]
+    # walking without git, an unchanged file list leaves the cache clean
+    config = replace(config, change_detection="walk")
+    discover_org_files(config, cache, now)
+    cache.dirty = False
+    assert discover_org_files(config, cache, now) == files
+    assert not cache.dirty
+    (temp_dir / "c.org").write_text("* TODO c\n")
+    discover_org_files(config, cache, now)
+    assert cache.dirty
+
+
+def test_run_tick_ledger_catches_up(
+    temp_dir: Path, stub_ntfy: ThreadingHTTPServer, scheduled_org: ScheduledOrg
+):
+    _, config = scheduled_org("Catch up node")
+    cache = ParseCache()
+    ledger = Ledger(temp_dir / "ledger.sqlite")
+    with create_session(1) as session:
+        # 08:20 is the last tick that ran, 08:30 (30 min reminder) up to 09:00 were missed
+        assert (
+            run_tick(config, EVENT - timedelta(minutes=40), session, cache, ledger)
+            == []
+        )
+        responses = run_tick(
+            config, EVENT + timedelta(minutes=3), session, cache, ledger
+        )
+        assert len(responses) == 3
+        assert (
+            run_tick(config, EVENT + timedelta(minutes=4), session, cache, ledger) == []
+        )
+        # a run overlapping the same window doesn't send again
+        ledger.finish_tick(EVENT - timedelta(minutes=40))
+        assert (
+            run_tick(config, EVENT + timedelta(minutes=4), session, cache, ledger) == []
+        )
+    ledger.close()
+    assert len(stub_ntfy.received) == 3
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_tick_async_pipeline(
+    temp_dir: Path,
+    test_org_file: Path,
+    test_time: datetime,
+    stub_ntfy: ThreadingHTTPServer,
+    workers: int,
+):
+    for i in range(3):
+        (temp_dir / f"copy{i}.org").write_text(test_org_file.read_text())
+    config = Config(
+        base_dir=temp_dir,
+        reminder_intervals=generate_scheduled_notification_intervals(),
+        ntfy_url=stub_ntfy.url,
+    )
+    with create_session(4) as session:
+        expected = run_tick(config, test_time, session, ParseCache())
+        sent = sorted(x[0]["Title"] for x in stub_ntfy.received)
+        stub_ntfy.received.clear()
+        config.pipeline, config.queue_size, config.workers = "async", 1, workers
+        stats = TickStats(time=test_time)
+        cache = ParseCache()
+        stored_on: set[str] = set()
+        store = cache.store
+        cache.store = lambda *args: (
+            stored_on.add(threading.current_thread().name),
+            store(*args),
+        )
+        responses = run_tick(
+            config,
+            test_time,
+            session,
+            cache,
+            Ledger(temp_dir / "ledger.sqlite"),
+            stats,
+        )
+    assert len(responses) == len(expected) > 0
+    assert sorted(x[0]["Title"] for x in stub_ntfy.received) == sent
+    assert (stats.files_scanned, stats.files_parsed) == (4, 4)
+    assert stats.notifications_sent == len(expected)
+    # parsed entries are installed on the match thread, not the event loop's
+    assert len(stored_on) == (workers > 1)
+    assert threading.current_thread().name not in stored_on
+
+
+def test_run_tick_outbox_retries(
+    temp_dir: Path, stub_ntfy: ThreadingHTTPServer, scheduled_org: ScheduledOrg
+):
+    _, config = scheduled_org("Retry node")
+    cache = ParseCache()
+    ledger = Ledger(temp_dir / "ledger.sqlite")
+    stub_ntfy.status, stub_ntfy.headers = 503, {"Retry-After": "300"}
+    with create_session(1) as session:
+        stats = TickStats(time=EVENT)
+        assert (
+            run_tick(config, EVENT, session, cache, ledger, stats)[0].status_code == 503
+        )
+        assert (stats.notifications_failed, stats.notifications_deferred) == (1, 1)
+        assert ledger.outbox_size() == 1
+        # Retry-After holds the retry back
+        assert (
+            run_tick(config, EVENT + timedelta(minutes=4), session, cache, ledger) == []
+        )
+        stub_ntfy.status, stub_ntfy.headers = 200, {}
+        stats = TickStats(time=EVENT)
+        responses = run_tick(
+            config, EVENT + timedelta(minutes=5), session, cache, ledger, stats
+        )
+    assert [x.status_code for x in responses] == [200]
+    assert (stats.notifications_retried, stats.notifications_sent) == (1, 1)
+    assert ledger.outbox_size() == 0
+    ledger.close()
+    assert len(stub_ntfy.received) == 2
+
+
+def test_outbox_claims_and_breaker(
+    temp_dir: Path, stub_ntfy: ThreadingHTTPServer, scheduled_org: ScheduledOrg
+):
+    _, config = scheduled_org("Held node")
+    ledger = Ledger(temp_dir / "ledger.sqlite")
+    # an open breaker holds the send back without counting it as an attempt
+    ledger.save_breaker(
+        CircuitBreaker(
+            failures=BREAKER_THRESHOLD, open_until=EVENT + timedelta(hours=1)
+        )
+    )
+    with create_session(1) as session:
+        stats = TickStats(time=EVENT)
+        assert run_tick(config, EVENT, session, ParseCache(), ledger, stats) == []
+    assert stub_ntfy.received == []
+    assert stats.notifications_deferred == 1
+    # two overlapping runs only retry it once
+    other = Ledger(temp_dir / "ledger.sqlite")
+    later = EVENT + timedelta(minutes=1)
+    assert [(x[0].title, x[1]) for x in ledger.claim_due(later)] == [("Held node", 0)]
+    assert other.claim_due(later) == []
+    assert other.claim_due(later + OUTBOX_CLAIM) != []
+    other.close()
+    ledger.close()
+
+
+# a replica answering "<leader>:<members>" for every line on stdin, until stdin closes
+REPLICA_SCRIPT = """
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from src.main import FlockCoordinator
+
+coordinator = FlockCoordinator(Path(sys.argv[1]), sys.argv[2])
+for _ in sys.stdin:
+    now = datetime.now(timezone.utc)
+    members = coordinator.members(now)
+    print(f"{coordinator.is_leader(now)}:{','.join(members)}", flush=True)
+"""
+
+
+def test_flock_coordination(temp_dir: Path):
+    replicas = {
+        name: subprocess.Popen(
+            [sys.executable, "-c", REPLICA_SCRIPT, str(temp_dir / "replicas"), name],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for name in "abc"
+    }
+
+    def tick() -> dict[str, tuple[bool, str]]:
+        for x in replicas.values():
+            x.stdin.write("\n")
+            x.stdin.flush()
+        answers = {}
+        for name, x in replicas.items():
+            leader, members = x.stdout.readline().strip().split(":")
+            answers[name] = (leader == "True", members)
+        return answers
+
+    try:
+        tick()
+        answers = tick()
+        assert [x[1] for x in answers.values()] == ["a,b,c"] * 3
+        assert sum(x[0] for x in answers.values()) == 1
+        # the leader dies, one of the others takes over and it drops out of the members
+        leader = next(name for name, x in answers.items() if x[0])
+        replicas.pop(leader).communicate("")
+        answers = tick()
+        assert sum(x[0] for x in answers.values()) == 1
+        assert {x[1] for x in answers.values()} == {",".join(sorted(replicas))}
+    finally:
+        for x in replicas.values():
+            x.communicate("")
+
+
+def test_sqlite_coordination(
+    temp_dir: Path, stub_ntfy: ThreadingHTTPServer, scheduled_org: ScheduledOrg
+):
+    now = datetime(year=2025, month=2, day=14, hour=9, minute=0, tzinfo=timezone.utc)
+    a, b = (
+        SqliteCoordinator(temp_dir / "leases.sqlite", x, timedelta(minutes=2))
+        for x in "ab"
+    )
+    assert a.is_leader(now) and not b.is_leader(now)
+    assert a.members(now) == ["a"] and b.members(now) == ["a", "b"]
+    # a stops renewing, b takes over once its lease runs out
+    assert not b.is_leader(now + timedelta(minutes=1))
+    assert b.is_leader(now + timedelta(minutes=2))
+    assert b.members(now + timedelta(minutes=2)) == ["b"]
+    # names are returned as they are, whatever they look like
+    east = SqliteCoordinator(
+        temp_dir / "leases.sqlite", "replica.east", timedelta(minutes=2)
+    )
+    assert east.members(now + timedelta(minutes=2)) == ["b", "replica.east"]
+    east.close()
+    a.close()
+    b.close()
+    # a replica leaving only moves its own keys
+    keys = [f"{i}.org" for i in range(1000)]
+    before, after = HashRing(["a", "b", "c"]), HashRing(["a", "b"])
+    assert {before.owner(x) for x in keys if before.owner(x) != after.owner(x)} == {"c"}
+    assert all(sum(before.owner(x) == name for x in keys) > 200 for name in "abc")
+
+    for i in range(12):
+        _, config = scheduled_org(f"Node {i}", f"{i}.org")
+    config = replace(
+        config,
+        coordination="sqlite",
+        coordination_mode="shard",
+        lease_ttl=timedelta(minutes=30),
+    )
+    replicas = [Replica(replace(config, replica=x)) for x in "ab"]
+    ledgers = [Ledger(temp_dir / "ledger.sqlite", replica=x) for x in "ab"]
+    for x in replicas:
+        x.plan(EVENT - timedelta(minutes=31))
+    with create_session(1) as session:
+        shares = [
+            run_tick(
+                config,
+                EVENT - timedelta(minutes=30),
+                session,
+                ParseCache(),
+                ledger,
+                replica=replica,
+            )
+            for ledger, replica in zip(ledgers, replicas)
+        ]
+        assert all(shares) and sum(map(len, shares)) == 12
+        # b misses the 08:45 tick while a runs it, b's next tick catches up on its own files
+        caught_up = [
+            run_tick(
+                config,
+                EVENT - timedelta(minutes=x),
+                session,
+                ParseCache(),
+                ledger,
+                replica=replica,
+            )
+            for x, ledger, replica in zip((15, 14), ledgers, replicas)
+        ]
+        assert list(map(len, caught_up)) == list(map(len, shares))
+        # b leaves, a takes all the files
+        replicas[1].close()
+        assert (
+            len(
+                run_tick(
+                    config,
+                    EVENT,
+                    session,
+                    ParseCache(),
+                    ledgers[0],
+                    replica=replicas[0],
+                )
+            )
+            == 12
+        )
+    replicas[0].close()
+    for x in ledgers:
+        x.close()
+    assert len(stub_ntfy.received) == 36
+    with pytest.raises(ValueError):
+        load_config(str(temp_dir), stub_ntfy.url, {"coordination": "zookeeper"})
+
+
+def test_replay(temp_dir: Path, scheduled_org: ScheduledOrg):
+    _, config = scheduled_org("Replayed node", repeater="+1d")
+    start, end = EVENT - timedelta(hours=1), EVENT + timedelta(days=1, minutes=1)
+    report = replay(config, start, end)
+    assert report.ticks == 25 * 60 + 1 and report.ticks_per_second > 0
+    assert [x[:2] for x in report.notifications] == [
+        (config.reminders.utc(EVENT + timedelta(days=day) - timedelta(minutes=x)), y)
+        for day in (0, 1)
+        for x, y in [
+            (30, "Replayed node (in 30 minutes)"),
+            (15, "Replayed node (in 15 minutes)"),
+            (0, "Replayed node (now)"),
+        ]
+    ]
+    assert replay(config, start, end).notifications == report.notifications
+    # the repo's own cache and ledger are left alone
+    assert sorted(x.name for x in temp_dir.iterdir()) == ["tasks.org"]
+
+
+def test_circuit_breaker():
+    now = datetime(year=2025, month=2, day=14, hour=9, minute=0)
+    breaker = CircuitBreaker(threshold=2, cooldown=timedelta(minutes=2))
+    breaker.record(False, now)
+    assert breaker.allow(now)
+    breaker.record(False, now)
+    assert not breaker.allow(now + timedelta(minutes=1))
+    # one probe after the cooldown, and only one at a time
+    assert breaker.allow(now + timedelta(minutes=2))
+    assert not breaker.allow(now + timedelta(minutes=2))
+    breaker.record(False, now + timedelta(minutes=2))
+    assert not breaker.allow(now + timedelta(minutes=3))
+    assert breaker.allow(now + timedelta(minutes=4))
+    breaker.record(True, now + timedelta(minutes=4))
+    assert breaker.allow(now + timedelta(minutes=4))
+    assert breaker.allow(now + timedelta(minutes=4))
+
+
+def test_tenants(
+    temp_dir: Path, stub_ntfy: ThreadingHTTPServer, scheduled_org: ScheduledOrg
+):
+    for repo in ("shared", "own"):
+        scheduled_org(f"{repo} node", base_dir=temp_dir / repo)
+    tenants_path = temp_dir / "tenants.json"
+    tenants_path.write_text(
+        json.dumps(
+            {
+                "tenants": [
+                    {
+                        "name": "alice",
+                        "base_dir": str(temp_dir / "shared"),
+                        "ntfy_url": stub_ntfy.url,
+                    },
+                    {
+                        "name": "bob",
+                        "base_dir": str(temp_dir / "shared"),
+                        "ntfy_url": stub_ntfy.url,
+                    },
+                    {
+                        "name": "carol",
+                        "base_dir": str(temp_dir / "own"),
+                        "ntfy_url": stub_ntfy.url,
+                        "delivery_concurrency": 2,
+                    },
+                ],
+                "concurrency": 2,
+            }
+        )
+    )
+    tenants, settings = load_tenants(tenants_path)
+    assert settings["concurrency"] == 2
+    assert tenants[2].config.delivery_concurrency == 2
+    groups = group_tenants(tenants)
+    assert [[x.name for x in group.tenants] for group in groups] == [
+        ["alice", "bob"],
+        ["carol"],
+    ]
+    with create_session(4) as session, ThreadPoolExecutor(max_workers=2) as executor:
+        schedule_tenants(groups, EVENT, session, executor)
+        results = [group.future.result() for group in groups]
+    for group in groups:
+        group.close()
+    assert {name: len(x) for result in results for name, x in result.items()} == {
+        "alice": 1,
+        "bob": 1,
+        "carol": 1,
+    }
+    assert sorted(x[0]["Title"] for x in stub_ntfy.received) == [
+        "own node (now)",
+        "shared node (now)",
+        "shared node (now)",
+    ]
+
+
+def test_run_tick_stats(
+    temp_dir: Path, stub_ntfy: ThreadingHTTPServer, scheduled_org: ScheduledOrg
+):
+    _, config = scheduled_org("Due node", "due.org", rest="* TODO Other node\n")
+    (temp_dir / "old.org").write_text("* TODO Old node\n  <2001-01-01 Mon>\n")
+    stats = TickStats(time=EVENT)
+    with create_session(1) as session:
+        run_tick(config, EVENT, session, ParseCache(prescan=True), stats=stats)
+    assert list(stats.phases) == ["discover", "parse", "match", "deliver"]
+    assert (stats.files_scanned, stats.files_parsed, stats.files_skipped) == (2, 2, 1)
+    assert stats.nodes == 1
+    assert (stats.notifications_sent, stats.notifications_failed) == (1, 0)
+    assert {x[0] for x in stats.slowest_files()} == {
+        str(temp_dir / "due.org"),
+        str(temp_dir / "old.org"),
+    }
+    metrics = MetricsServer(port=0, host="127.0.0.1")
+    try:
+        metrics.stats = stats
+        text = requests.get(f"http://127.0.0.1:{metrics.port}/metrics").text
+    finally:
+        metrics.close()
+    assert text == stats.to_prometheus()
+    assert "org_notifier_tick_notifications_sent 1\n" in text
+    assert 'org_notifier_tick_phase_seconds{phase="match"}' in text
+
+
+def test_benchmark_smoke():
+    from benchmarks.bench_pipeline import bench_size
+
+    results = bench_size(headings=50, repeat=1, seed=0)
+    assert {x["name"] for x in results} >= {"parse_file", "main_cold", "main_warm"}
+
+
+def imported_modules(*args: str, env: dict[str, str] | None = None) -> set[str]:
+    """Top-level packages `python -X importtime *args` imports"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return {
+        x.rsplit("|", 1)[1].strip().split(".")[0]
+        for x in result.stderr.splitlines()
+        if x.startswith("import time:") and "|" in x
+    }
+
+
+def test_idle_tick_imports(temp_dir: Path):
+    (temp_dir / "a.org").write_text(
+        "* TODO long done\n  SCHEDULED: <2020-01-01 Wed 09:00>\n"
+    )
+    env = {
+        **os.environ,
+        "NTFY_URL": "http://127.0.0.1:9/topic",
+        "ORG_BASEDIR": str(temp_dir),
+    }
+    # the first run parses the file into the cache, the second has nothing to parse or send
+    subprocess.run(
+        [sys.executable, "src/main.py"], env=env, check=True, capture_output=True
+    )
+    imported = imported_modules("src/main.py", env=env) - imported_modules("-c", "")
+    assert not imported & {
+        "requests",
+        "urllib3",
+        "orgparse",
+        "dateutil",
+        "asyncio",
+        "concurrent",
+        "http",
+        "email",
+        "cProfile",
+    }
+    # nodes orgparse parsed outside the module work without parse_file() loading it first
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import orgparse\n"
+            "from datetime import datetime\n"
+            "from src.main import generate_reminder_intervals, node_and_time_for_notification\n"
+            "root = orgparse.loads('* TODO a\\n  :PROPERTIES:\\n  :X: <2025-02-14 Fri 09:00>\\n  :END:\\n')\n"
+            "print(node_and_time_for_notification(\n"
+            "    datetime(2025, 2, 14, 9), root, generate_reminder_intervals()\n"
+            ")[0][0].heading)",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    assert result.stdout.strip() == "a"